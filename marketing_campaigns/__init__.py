@@ -0,0 +1,6 @@
+"""Reusable building blocks for the EGYPT hotel booking campaign analysis.
+
+The notebook-exported scripts in this repository import from the submodules
+directly (``from marketing_campaigns.loader import load_bookings``); nothing is
+imported here so that importing one stage never pays for the others.
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from marketing_campaigns.cli import main
+
+sys.exit(main())
@@ -0,0 +1,218 @@
+"""Scaling benchmarks of the pipeline stages.
+
+Each stage (the outlier filter, the ``explo`` profile, the cancellation ratios,
+the six campaign queries, featurization and the five model fits) is timed at
+several data sizes. The input of a size is a synthetic booking dataset of that
+many rows (or, given a csv, the csv resampled to that many rows), kept in the
+cache directory so only the first run pays for building it.
+Every (stage, size) pair runs in a fresh process, which keeps the peak RSS of
+one measurement from leaking into the next; the results are written as JSON
+and can be compared with a saved baseline.
+"""
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from marketing_campaigns.cache import DEFAULT_CACHE_DIR, load_or_build
+
+DEFAULT_SIZES = [100_000, 1_000_000, 10_000_000, 100_000_000]
+DEFAULT_TOLERANCE = 0.1
+
+
+def _resample(path, rows, seed):
+    from marketing_campaigns.loader import load_bookings
+
+    df = load_bookings(path)
+    return df.sample(n=rows, replace=True, random_state=seed, ignore_index=True)
+
+
+def scaled_bookings(path, rows, seed=0, cache_dir=DEFAULT_CACHE_DIR):
+    """The bookings of ``path`` resampled (with replacement) to ``rows`` rows, through the cache."""
+    return load_or_build(path, {"rows": rows, "seed": seed}, _resample, cache_dir=cache_dir, name="bench")
+
+
+def synthetic_input(rows, seed=0, cache_dir=DEFAULT_CACHE_DIR):
+    """Directory of a synthetic dataset of ``rows`` bookings, generated on the first call."""
+    from marketing_campaigns.synthetic import GENERATOR_VERSION, synthetic_complete, write_synthetic
+
+    path = os.path.join(cache_dir, f"synthetic-{rows}-{seed}-v{GENERATOR_VERSION}")
+    if not synthetic_complete(path):
+        write_synthetic(path, rows, seed=seed)
+    return path
+
+
+def _input(path, rows, seed, cache_dir):
+    if path is None:
+        from marketing_campaigns.synthetic import read_synthetic
+
+        return read_synthetic(synthetic_input(rows, seed=seed, cache_dir=cache_dir))
+    return scaled_bookings(path, rows, seed=seed, cache_dir=cache_dir)
+
+
+# setup(df) -> state is not timed; run(state) -> rows out is
+
+def _setup_cleaned(df):
+    from marketing_campaigns.loader import clean_bookings
+
+    return clean_bookings(df)
+
+
+def _run_remove_outlier(df):
+    from marketing_campaigns.outliers import remove_outlier
+    from marketing_campaigns.schema import OUTLIER_COLUMNS
+
+    return len(remove_outlier(df, OUTLIER_COLUMNS))
+
+
+def _run_profile(df):
+    from marketing_campaigns.profile import DataProfile
+
+    # a new profile, not the cached one of profile_frame()
+    return len(DataProfile(df).summary())
+
+
+def _run_cube(df):
+    from marketing_campaigns.cube import cancellation_cube
+
+    return len(cancellation_cube(df).table)
+
+
+def _setup_spark(df):
+    from marketing_campaigns.preprocess import preprocess_bookings
+    from marketing_campaigns.spark_io import create_spark_session, to_spark
+
+    spark = create_spark_session()
+    sdf, _ = to_spark(spark, preprocess_bookings(df))
+    sdf.createOrReplaceTempView("hotels_booking")
+    return sdf
+
+
+def _run_campaign_sql(sdf):
+    from marketing_campaigns.campaign_sql import INSIGHT_QUERIES, campaign_insight, materialize_campaign_aggregates
+
+    materialize_campaign_aggregates(sdf.sparkSession)
+    return sum(len(campaign_insight(sdf.sparkSession, name).collect()) for name in INSIGHT_QUERIES)
+
+
+def _run_featurization(sdf):
+    from marketing_campaigns.featurize import feature_frame, fit_featurization, select_features
+
+    sdf_cleaned = select_features(sdf)
+    return feature_frame(fit_featurization(sdf_cleaned), sdf_cleaned).count()
+
+
+def _setup_features(df):
+    from marketing_campaigns.featurize import feature_frame, fit_featurization, select_features
+
+    sdf_cleaned = select_features(_setup_spark(df))
+    features = feature_frame(fit_featurization(sdf_cleaned), sdf_cleaned)
+    return features.randomSplit([0.8, 0.2], seed=12345)
+
+
+def _run_model_fits(splits):
+    from marketing_campaigns.model_zoo import train_model_zoo
+
+    return len(train_model_zoo(*splits).comparison)
+
+
+# name: (setup, run); the Spark stages report the RSS of the Python driver only
+BENCHMARKS = {
+    "remove_outlier": (_setup_cleaned, _run_remove_outlier),
+    "profile": (None, _run_profile),
+    "cancellation_ratios": (None, _run_cube),
+    "campaign_sql": (_setup_spark, _run_campaign_sql),
+    "featurization": (_setup_spark, _run_featurization),
+    "model_fits": (_setup_features, _run_model_fits),
+}
+
+
+def _max_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _measure(stage, path, rows, seed, cache_dir):
+    setup, run = BENCHMARKS[stage]
+    state = _input(path, rows, seed, cache_dir)
+    if setup is not None:
+        state = setup(state)
+    rss_before = _max_rss_mb()
+    start = time.perf_counter()
+    rows_out = run(state)
+    seconds = time.perf_counter() - start
+    peak = _max_rss_mb()
+    return {"stage": stage, "rows": rows, "rows_out": int(rows_out), "wall_seconds": seconds,
+            "rows_per_second": rows / seconds if seconds > 0 else None,
+            "peak_rss_mb": peak, "stage_rss_mb": max(peak - rss_before, 0.0)}
+
+
+def run_benchmarks(path=None, sizes=DEFAULT_SIZES, stages=None, seed=0, cache_dir=DEFAULT_CACHE_DIR):
+    """Time every stage at every size, each measurement in its own process.
+
+    Parameters:
+    - path: booking csv the inputs are resampled from (default: synthetic bookings)
+    - sizes: row counts
+    - stages: names from BENCHMARKS (default: all)
+    - seed: seed of the synthetic data or the resampling
+    - cache_dir: directory of the inputs
+
+    Returns:
+    - dict with "meta" (environment) and "results" (one record per stage and size)
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for rows in sizes:
+        if path is None:
+            # generated up front with all the CPUs, not inside a measurement
+            synthetic_input(rows, seed=seed, cache_dir=cache_dir)
+        for stage in stages or list(BENCHMARKS):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                record = pool.submit(_measure, stage, path, rows, seed, cache_dir).result()
+            results.append(record)
+            print(f"{stage:20} {rows:>12,} rows  {record['wall_seconds']:9.2f}s  "
+                  f"{record['peak_rss_mb']:9.0f} MB peak", flush=True)
+    meta = {"source": path or "synthetic", "seed": seed, "python": platform.python_version(),
+            "machine": platform.machine(), "processor": platform.processor(), "cpus": multiprocessing.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    return {"meta": meta, "results": results}
+
+
+def save_results(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Compare the wall time and peak RSS of a run with a baseline run.
+
+    Parameters:
+    - results: output of run_benchmarks()
+    - baseline: output of an earlier run_benchmarks(), e.g. from load_results()
+    - tolerance: relative slowdown (or memory growth) tolerated before flagging a regression
+
+    Returns:
+    - DataFrame indexed by (stage, rows) with the baseline and current values, their ratios
+      and a regression flag; pairs missing from the baseline are left out
+    """
+    import pandas as pd
+
+    key = ["stage", "rows"]
+    current = pd.DataFrame(results["results"]).set_index(key)
+    previous = pd.DataFrame(baseline["results"]).set_index(key)
+    table = current[["wall_seconds", "peak_rss_mb"]].join(
+        previous[["wall_seconds", "peak_rss_mb"]], rsuffix="_baseline", how="inner")
+    table["time_ratio"] = table["wall_seconds"] / table["wall_seconds_baseline"]
+    table["rss_ratio"] = table["peak_rss_mb"] / table["peak_rss_mb_baseline"]
+    table["regression"] = (table["time_ratio"] > 1 + tolerance) | (table["rss_ratio"] > 1 + tolerance)
+    return table
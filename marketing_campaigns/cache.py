@@ -0,0 +1,130 @@
+"""Columnar on-disk cache of the preprocessed booking frame.
+
+The cleaned frame is written once as an uncompressed Arrow IPC (Feather v2)
+file whose name is derived from a hash of the source file's content and of the
+preprocessing parameters. A later run with the same inputs reads that file
+back -- a columnar copy into pandas, without parsing or preprocessing --
+instead of re-parsing the csv and redoing the preprocessing.
+"""
+import functools
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pyarrow.feather as feather
+
+from marketing_campaigns.loader import load_bookings
+from marketing_campaigns.preprocess import preprocess_bookings
+from marketing_campaigns.schema import OUTLIER_COLUMNS
+
+# bump when the preprocessing code changes in a way the parameters don't capture
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = ".cache"
+
+
+def file_digest(path, block_size=1 << 20):
+    """sha256 of the file content, read in blocks so large exports don't need to fit in memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(path, params):
+    """Key of a cached frame built from ``path`` with ``params`` (a json-serializable dict)."""
+    digest = hashlib.sha256()
+    digest.update(file_digest(path).encode())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    digest.update(str(CACHE_VERSION).encode())
+    return digest.hexdigest()[:16]
+
+
+@contextmanager
+def atomic_path(path):
+    """Yield a temporary file name next to ``path`` that replaces ``path`` when the block succeeds.
+
+    Every writer gets its own temporary file, so concurrent builds of the same file don't
+    interfere; the last one to finish wins.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def write_frame(df, path):
+    """Write ``df`` as an uncompressed Arrow IPC file, atomically."""
+    with atomic_path(path) as tmp:
+        # uncompressed so that reading needs no decoding
+        feather.write_feather(df, tmp, compression="uncompressed")
+
+
+def read_frame(path, columns=None):
+    """Read a file written by :func:`write_frame` as a DataFrame.
+
+    The file is memory-mapped, but ``to_pandas`` copies every column into pandas memory:
+    the result costs as much memory as the frame, only the parsing is saved. Pass
+    ``columns`` to read a subset.
+    """
+    return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+
+def load_or_build(path, params, build, cache_dir=DEFAULT_CACHE_DIR, name="bookings"):
+    """Return the cached frame for ``path``/``params``, building and caching it on a miss.
+
+    Parameters:
+    - path: source file the frame is derived from
+    - params: json-serializable parameters of ``build``
+    - build: callable ``build(path, **params)`` returning a DataFrame
+    - cache_dir: directory holding the cached files
+    - name: file name prefix
+
+    Returns:
+    - DataFrame
+    """
+    target = os.path.join(cache_dir, f"{name}-{cache_key(path, params)}.arrow")
+    if os.path.exists(target):
+        return read_frame(target)
+    df = build(path, **params)
+    write_frame(df, target)
+    return df
+
+
+def _build_preprocessed(path, outlier_columns, interpolation, outlier_mode, chunksize=None, vocabulary=None):
+    df = load_bookings(path, clean=True, chunksize=chunksize, vocabulary=vocabulary)
+    return preprocess_bookings(df, outlier_columns=outlier_columns, interpolation=interpolation,
+                               outlier_mode=outlier_mode)
+
+
+def load_preprocessed(path, cache_dir=DEFAULT_CACHE_DIR, outlier_columns=OUTLIER_COLUMNS,
+                      interpolation="linear", outlier_mode="sequential", chunksize=None, vocabulary=None):
+    """Load the preprocessed booking frame (cleaned, outliers removed, with revenue) through the cache.
+
+    Parameters:
+    - path: path of the booking csv
+    - cache_dir: directory holding the cached files
+    - outlier_columns: columns passed to the IQR filter
+    - interpolation: quantile interpolation of the IQR filter
+    - outlier_mode: 'sequential' or 'joint' semantics of the IQR filter
+    - chunksize: chunk size used when the csv has to be parsed
+    - vocabulary: encoding.Vocabulary; the categoricals are stored with its stable codes
+
+    Returns:
+    - DataFrame
+    """
+    # chunksize only bounds memory while parsing, it doesn't change the result
+    params = {"outlier_columns": list(outlier_columns), "interpolation": interpolation,
+              "outlier_mode": outlier_mode}
+    build = functools.partial(_build_preprocessed, chunksize=chunksize, vocabulary=vocabulary)
+    df = load_or_build(path, params, build, cache_dir=cache_dir)
+    # a file cached before the vocabulary gained labels is recoded onto the current codes
+    return df if vocabulary is None else vocabulary.encode(df)
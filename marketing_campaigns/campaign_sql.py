@@ -0,0 +1,145 @@
+"""Precomputed aggregates behind the campaign SQL insights.
+
+The notebook runs six ``spark.sql(...).show()`` queries against the uncached
+``hotels_booking`` view, each a full scan. :func:`materialize_campaign_aggregates`
+computes the grouped ones in a single ``GROUPING SETS`` scan (with the
+``is_canceled = 0`` filter folded into conditional aggregates) and the scores
+of the loyalty candidates in a second, filter-only scan, caches them as small
+tables, and :func:`campaign_insight` answers the insight queries from those
+tables.
+"""
+AGGREGATES_TABLE = "campaign_aggregates"
+LOYALTY_TABLE = "campaign_loyalty"
+
+# one view per grouping set of AGGREGATES_TABLE
+DIMENSION_VIEWS = {
+    "agent": "campaign_agents",
+    "reserved_room_type": "campaign_rooms",
+    "arrival_date_month": "campaign_months",
+    "stays_in_weekend_nights": "campaign_weekend_nights",
+}
+
+AGGREGATES_SQL = """
+select
+    case when grouping(agent) = 0 then 'agent'
+         when grouping(reserved_room_type) = 0 then 'reserved_room_type'
+         when grouping(arrival_date_month) = 0 then 'arrival_date_month'
+         else 'stays_in_weekend_nights' end as dimension,
+    agent, reserved_room_type, arrival_date_month, stays_in_weekend_nights,
+    count(*) as bookings,
+    count(adr) as n_adr,
+    sum(adr) as sum_adr,
+    count(if(is_canceled = 0, 1, null)) as kept_bookings,
+    count(if(is_canceled = 0, adr, null)) as kept_n_adr,
+    sum(if(is_canceled = 0, adr, null)) as kept_sum_adr,
+    sum(if(is_canceled = 0, revenue, null)) as kept_revenue
+from {source}
+group by grouping sets ((agent), (reserved_room_type), (arrival_date_month), (stays_in_weekend_nights))
+"""
+
+# only the bookings that can appear in the loyalty ranking are kept, and only their score columns;
+# loyalty.spark_loyalty_rows gives the full rows of the top ones
+LOYALTY_SQL = """
+select previous_cancellations, previous_bookings_not_canceled,
+    (previous_cancellations - previous_bookings_not_canceled) as loyality
+from {source}
+where (previous_cancellations - previous_bookings_not_canceled) > 1
+"""
+
+INSIGHT_QUERIES = {
+    # most repeated agencies with non cancelled bookings
+    "top_agents": """
+        select agent, kept_bookings as numberOfBookings from campaign_agents
+        where agent is not null and not isnan(agent) and kept_bookings > 0
+        order by numberOfBookings DESC
+        limit {limit}""",
+    # bookings with a large difference between cancelled and not cancelled previous bookings
+    "loyalty": """
+        select * from campaign_loyalty
+        order by loyality
+        limit {limit}""",
+    # number of stays in weekend and the adr
+    "weekend_adr": """
+        select sum_adr / n_adr as AVG_adr, stays_in_weekend_nights from campaign_weekend_nights
+        where n_adr > 0
+        order by AVG_adr DESC
+        limit {limit}""",
+    # least booked room types
+    "least_booked_rooms": """
+        select reserved_room_type, kept_bookings as counter from campaign_rooms
+        where reserved_room_type is not null and kept_bookings > 0
+        order by counter
+        limit {limit}""",
+    # average room price in each month
+    "monthly_adr": """
+        select arrival_date_month, kept_sum_adr / kept_n_adr as avg_price from campaign_months
+        where kept_n_adr > 0
+        order by avg_price DESC
+        limit {limit}""",
+    # total revenue in each month
+    "monthly_revenue": """
+        select arrival_date_month, cast(kept_revenue as numeric(36,2)) as Total_revenue from campaign_months
+        where kept_bookings > 0
+        order by Total_revenue DESC
+        limit {limit}""",
+}
+
+# the notebook shows every row of these
+UNLIMITED_INSIGHTS = ("least_booked_rooms", "monthly_adr", "monthly_revenue")
+
+
+def materialize_campaign_aggregates(spark, source="hotels_booking", path=None):
+    """Compute every campaign aggregate and cache them as small tables.
+
+    ``source`` is scanned twice: once for all the grouped aggregates and once for the
+    scores of the loyalty candidates.
+
+    Parameters:
+    - spark: SparkSession
+    - source: table or view holding the preprocessed bookings (with ``revenue``)
+    - path: optional directory; the tables are also written there as Parquet so
+      that other sessions can read them with :func:`load_campaign_aggregates`
+
+    Returns:
+    - list of the registered table/view names
+    """
+    for table, sql in ((AGGREGATES_TABLE, AGGREGATES_SQL), (LOYALTY_TABLE, LOYALTY_SQL)):
+        frame = spark.sql(sql.format(source=source))
+        if path is not None:
+            frame.write.mode("overwrite").parquet(f"{path}/{table}")
+            frame = spark.read.parquet(f"{path}/{table}")
+        frame.createOrReplaceTempView(table)
+        spark.sql(f"cache table {table}")
+    _register_dimension_views(spark)
+    return [AGGREGATES_TABLE, LOYALTY_TABLE] + list(DIMENSION_VIEWS.values())
+
+
+def load_campaign_aggregates(spark, path):
+    """Register and cache the tables written by ``materialize_campaign_aggregates(..., path=...)``."""
+    for table in (AGGREGATES_TABLE, LOYALTY_TABLE):
+        spark.read.parquet(f"{path}/{table}").createOrReplaceTempView(table)
+        spark.sql(f"cache table {table}")
+    _register_dimension_views(spark)
+
+
+def _register_dimension_views(spark):
+    for dimension, view in DIMENSION_VIEWS.items():
+        spark.sql(f"select * from {AGGREGATES_TABLE} where dimension = '{dimension}'").createOrReplaceTempView(view)
+
+
+def campaign_insight(spark, name, limit=None):
+    """Answer one of the campaign insight queries from the materialized tables.
+
+    Parameters:
+    - spark: SparkSession
+    - name: one of INSIGHT_QUERIES
+    - limit: number of rows (default: 5, or all rows for the per-month/per-room breakdowns)
+
+    Returns:
+    - Spark DataFrame
+    """
+    if name not in INSIGHT_QUERIES:
+        raise ValueError(f"unknown insight {name!r}, expected one of {sorted(INSIGHT_QUERIES)}")
+    if limit is None:
+        limit = 2 ** 31 - 1 if name in UNLIMITED_INSIGHTS else 5
+    return spark.sql(INSIGHT_QUERIES[name].format(limit=limit))
@@ -0,0 +1,263 @@
+"""Command-line entry point with one subcommand per stage of the analysis.
+
+    python -m marketing_campaigns profile egphotelbookings.csv
+    python -m marketing_campaigns clean egphotelbookings.csv
+    python -m marketing_campaigns eda egphotelbookings.csv --out report
+    python -m marketing_campaigns campaign-sql egphotelbookings.csv
+    python -m marketing_campaigns train egphotelbookings.csv --model-dir models
+    python -m marketing_campaigns score models/gbt_scorer.npz --booking '{"hotel": ...}'
+    python -m marketing_campaigns run egphotelbookings.csv --target eda --target models
+    python -m marketing_campaigns bench --sizes 100000 1000000 --baseline bench.json
+    python -m marketing_campaigns synth bookings.parquet --rows 100000000
+    python -m marketing_campaigns ingest campaign_state bookings-2026-10-18.csv
+
+Only argparse is imported at startup; every subcommand imports the libraries it
+needs when it runs, and only ``campaign-sql`` and ``train`` start Spark.
+"""
+import argparse
+import json
+import os
+import sys
+
+
+def _preprocessed(args, vocabulary=None):
+    from marketing_campaigns.cache import load_preprocessed
+
+    return load_preprocessed(args.path, cache_dir=args.cache_dir, interpolation=args.interpolation,
+                             outlier_mode=args.outlier_mode, chunksize=args.chunksize, vocabulary=vocabulary)
+
+
+def _bookings_view(args, vocabulary=None):
+    from marketing_campaigns.spark_io import create_spark_session, to_spark
+
+    spark = create_spark_session()
+    sdf, transfer = to_spark(spark, _preprocessed(args, vocabulary))
+    print(transfer)
+    sdf.createOrReplaceTempView("hotels_booking")
+    return spark, sdf
+
+
+def cmd_profile(args):
+    import pandas as pd
+
+    from marketing_campaigns.loader import load_bookings
+    from marketing_campaigns.profile import profile_frame
+
+    df = load_bookings(args.path, chunksize=args.chunksize)
+    print(f"Data dimension: {df.shape}")
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+        print(profile_frame(df).summary())
+
+
+def cmd_clean(args):
+    df = _preprocessed(args)
+    print(f"Data dimension: {df.shape}")
+
+
+def cmd_eda(args):
+    from marketing_campaigns.report import eda_chart_jobs, render_report
+
+    results = render_report(eda_chart_jobs(_preprocessed(args)), args.out, max_workers=args.workers,
+                            force=args.force)
+    for name, (path, rendered) in sorted(results.items()):
+        print(f"{'rendered' if rendered else 'unchanged'}  {path}")
+
+
+def cmd_campaign_sql(args):
+    from marketing_campaigns.campaign_sql import INSIGHT_QUERIES, campaign_insight, materialize_campaign_aggregates
+
+    spark, _ = _bookings_view(args)
+    materialize_campaign_aggregates(spark, path=args.save)
+    for name in INSIGHT_QUERIES:
+        print(name)
+        campaign_insight(spark, name).show()
+
+
+def cmd_train(args):
+    from marketing_campaigns.cache import file_digest
+    from marketing_campaigns.encoding import VOCABULARY_FILE, Vocabulary
+    from marketing_campaigns.featurize import feature_frame, fit_featurization, select_features
+    from marketing_campaigns.model_zoo import train_model_zoo
+    from marketing_campaigns.scorer import export_scorer
+
+    os.makedirs(args.model_dir, exist_ok=True)
+    # the codes of earlier trainings are kept; labels first seen now are appended
+    vocabulary_path = os.path.join(args.model_dir, VOCABULARY_FILE)
+    vocabulary = Vocabulary.load(vocabulary_path) if os.path.exists(vocabulary_path) else Vocabulary()
+    _, sdf = _bookings_view(args, vocabulary)
+    vocabulary.save(vocabulary_path)
+    sdf_cleaned = select_features(sdf)
+    data = {"source": file_digest(args.path), "interpolation": args.interpolation, "outlier_mode": args.outlier_mode}
+    featurization = fit_featurization(sdf_cleaned, path=os.path.join(args.model_dir, "featurization"),
+                                      vocabulary=vocabulary, data=data)
+    features = feature_frame(featurization, sdf_cleaned)
+    train, test = features.randomSplit([0.8, 0.2], seed=12345)
+    zoo = train_model_zoo(train, test)
+    print(zoo.comparison.to_string())
+    for name, model in zoo.models.items():
+        print(export_scorer(featurization, model, os.path.join(args.model_dir, f"{name}_scorer.npz")))
+
+
+def cmd_score(args):
+    from marketing_campaigns.scorer import BookingScorer
+
+    scorer = BookingScorer.load(args.scorer)
+    if args.booking is not None:
+        print(scorer.score(json.loads(args.booking)))
+        return
+    import pandas as pd
+
+    columns = set(scorer.columns)
+    bookings = pd.read_csv(args.input, usecols=lambda c: c in columns)
+    for score in scorer.score_batch(bookings):
+        print(score)
+
+
+def cmd_run(args):
+    from marketing_campaigns.dag import StageGraph, booking_sources, booking_stages
+    from marketing_campaigns.instrument import Tracer
+
+    stages = booking_stages(interpolation=args.interpolation, outlier_mode=args.outlier_mode,
+                            chunksize=args.chunksize, report_dir=args.out, model_dir=args.model_dir)
+    tracer = Tracer(memory=args.trace_memory) if args.trace is not None else None
+    graph = StageGraph(stages, checkpoint_dir=args.checkpoint_dir, tracer=tracer)
+    results = graph.run(booking_sources(args.path, args.model_dir), targets=args.target, max_workers=args.workers,
+                        force=args.force)
+    for name, state in sorted(results["_status"].items()):
+        print(f"{state:8} {name}")
+    if tracer is not None:
+        tracer.to_json(args.trace)
+        print(tracer.summary().to_string(float_format="{:.2f}".format))
+
+
+def cmd_bench(args):
+    import pandas as pd
+
+    from marketing_campaigns.benchmarks import compare, load_results, run_benchmarks, save_results
+
+    results = run_benchmarks(args.source, sizes=args.sizes, stages=args.stage, seed=args.seed,
+                             cache_dir=args.cache_dir)
+    save_results(results, args.out)
+    if args.baseline is not None:
+        table = compare(results, load_results(args.baseline), tolerance=args.tolerance)
+        with pd.option_context("display.width", 200):
+            print(table)
+        if table["regression"].any():
+            return 1
+    return 0
+
+
+def cmd_synth(args):
+    from marketing_campaigns.synthetic import write_synthetic
+
+    print(write_synthetic(args.out, args.rows, chunk_rows=args.chunk_rows, seed=args.seed,
+                          max_workers=args.workers, partition_cols=args.partition_by))
+
+
+def cmd_ingest(args):
+    from marketing_campaigns.incremental import ingest_files
+
+    aggregates, added = ingest_files(args.state, args.paths, chunksize=args.chunksize)
+    for path in args.paths:
+        print(f"{'added' if path in added else 'skipped'}  {path}")
+    if args.refresh_bounds:
+        aggregates.refresh_bounds()
+        aggregates.save(args.state)
+    print(aggregates.top_agents().to_string())
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="marketing_campaigns", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def with_source(command):
+        command.add_argument("path", help="booking csv (egphotelbookings.csv schema)")
+        command.add_argument("--chunksize", type=int, default=None, help="parse the csv in chunks of this many rows")
+        return command
+
+    def with_preprocessing(command):
+        with_source(command)
+        command.add_argument("--cache-dir", default=".cache", help="directory of the preprocessed-frame cache")
+        command.add_argument("--interpolation", choices=["linear", "midpoint"], default="linear")
+        command.add_argument("--outlier-mode", choices=["sequential", "joint"], default="sequential")
+        return command
+
+    profile = with_source(commands.add_parser("profile", help="types, missing %%, overview and outliers per column"))
+    profile.set_defaults(func=cmd_profile)
+    clean = with_preprocessing(commands.add_parser("clean", help="preprocess the bookings into the cache"))
+    clean.set_defaults(func=cmd_clean)
+
+    eda = with_preprocessing(commands.add_parser("eda", help="render the EDA charts"))
+    eda.add_argument("--out", default="report", help="output directory of the charts")
+    eda.add_argument("--workers", type=int, default=None, help="number of rendering processes")
+    eda.add_argument("--force", action="store_true", help="render unchanged charts too")
+    eda.set_defaults(func=cmd_eda)
+
+    sql = with_preprocessing(commands.add_parser("campaign-sql", help="campaign insight queries (Spark)"))
+    sql.add_argument("--save", default=None, help="also write the aggregate tables as Parquet here")
+    sql.set_defaults(func=cmd_campaign_sql)
+
+    train = with_preprocessing(commands.add_parser("train", help="train and compare the classifiers (Spark)"))
+    train.add_argument("--model-dir", default="models", help="directory of the featurization model and scorers")
+    train.set_defaults(func=cmd_train)
+
+    score = commands.add_parser("score", help="score bookings with an exported scorer (no Spark)")
+    score.add_argument("scorer", help=".npz file written by train / export_scorer")
+    source = score.add_mutually_exclusive_group(required=True)
+    source.add_argument("--booking", help="one booking as a json object")
+    source.add_argument("--input", help="csv of bookings to score")
+    score.set_defaults(func=cmd_score)
+
+    run = with_source(commands.add_parser("run", help="run the workflow stages, reusing unchanged checkpoints"))
+    run.add_argument("--interpolation", choices=["linear", "midpoint"], default="linear")
+    run.add_argument("--outlier-mode", choices=["sequential", "joint"], default="sequential")
+    run.add_argument("--target", action="append", default=None,
+                     help="stage to produce, repeatable (default: every stage)")
+    run.add_argument("--force", action="append", default=[], help="stage to re-execute, repeatable")
+    run.add_argument("--checkpoint-dir", default=".checkpoints", help="directory of the stage checkpoints")
+    run.add_argument("--workers", type=int, default=4, help="number of stages running at the same time")
+    run.add_argument("--out", default="report", help="output directory of the charts")
+    run.add_argument("--model-dir", default="models", help="directory of the featurization model and scorers")
+    run.add_argument("--trace", default=None, help="write a json trace of the executed stages here")
+    run.add_argument("--trace-memory", action="store_true",
+                     help="also trace the Python allocation peak per stage (tracemalloc, slow)")
+    run.set_defaults(func=cmd_run)
+
+    bench = commands.add_parser("bench", help="time the stages at several data sizes")
+    bench.add_argument("--source", default=None,
+                       help="booking csv to resample the inputs from (default: synthetic bookings)")
+    bench.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000, 100_000_000])
+    bench.add_argument("--stage", action="append", default=None, help="stage to time, repeatable (default: all)")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--cache-dir", default=".cache", help="directory of the benchmark inputs")
+    bench.add_argument("--out", default="bench_results.json", help="results file")
+    bench.add_argument("--baseline", default=None, help="earlier results file to compare with")
+    bench.add_argument("--tolerance", type=float, default=0.1, help="relative slowdown flagged as a regression")
+    bench.set_defaults(func=cmd_bench)
+
+    synth = commands.add_parser("synth", help="generate synthetic bookings as partitioned Parquet")
+    synth.add_argument("out", help="output dataset directory")
+    synth.add_argument("--rows", type=int, required=True)
+    synth.add_argument("--chunk-rows", type=int, default=1_000_000, help="rows generated per task")
+    synth.add_argument("--seed", type=int, default=0)
+    synth.add_argument("--workers", type=int, default=None, help="number of generating processes")
+    synth.add_argument("--partition-by", nargs="*", default=["arrival_date_year"], help="partition columns")
+    synth.set_defaults(func=cmd_synth)
+
+    ingest = commands.add_parser("ingest", help="add new booking files to the saved campaign aggregates")
+    ingest.add_argument("state", help="directory of the aggregate state, created on the first ingest")
+    ingest.add_argument("paths", nargs="+", help="booking csv files (egphotelbookings.csv schema)")
+    ingest.add_argument("--chunksize", type=int, default=None, help="parse the csv in chunks of this many rows")
+    ingest.add_argument("--refresh-bounds", action="store_true",
+                        help="recompute the outlier bounds of later ingests from every row seen so far")
+    ingest.set_defaults(func=cmd_ingest)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""Streaming, mergeable correlation matrices.
+
+``df.corr(numeric_only=True)`` needs the whole numeric frame in memory and
+runs on one core. :class:`CoMoments` keeps the pairwise co-moment state of a
+set of columns -- counts, means, sums of squared deviations and co-moments
+per column pair -- which is computed per chunk (or per Spark partition) with
+a few matrix products and combined with the pairwise update of Chan et al.
+The Pearson matrix of the merged state is the one ``df.corr`` returns,
+including its pairwise handling of missing values. Spearman correlation uses
+approximate ranks from a mergeable :class:`RankSketch`.
+"""
+import numpy as np
+import pandas as pd
+
+from marketing_campaigns.mergeable import reduce_chunks, reduce_partitions, row_chunks
+
+CORRELATION_METHODS = ("pearson", "spearman")
+DEFAULT_CHUNK_ROWS = 1_000_000
+DEFAULT_RANK_DIGITS = 3
+
+
+def _divide(a, b):
+    return np.divide(a, b, out=np.zeros_like(a), where=b > 0)
+
+
+class CoMoments:
+    """Pairwise co-moments of a set of columns.
+
+    For every pair (i, j) the rows where both columns are present count; entry
+    [i, j] of ``mean`` and ``m2`` describes column i over those rows, so column j's
+    figures for the pair are the transposed entries.
+
+    Parameters:
+    - columns: column names
+    - n: pair counts
+    - mean: means of column i over the pair rows
+    - m2: sums of squared deviations of column i over the pair rows
+    - comoment: sums of products of the deviations of i and j
+    """
+
+    def __init__(self, columns, n, mean, m2, comoment):
+        self.columns = list(columns)
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.comoment = comoment
+
+    @classmethod
+    def empty(cls, columns):
+        k = len(columns)
+        return cls(columns, *(np.zeros((k, k)) for _ in range(4)))
+
+    @classmethod
+    def from_array(cls, values, columns):
+        """State of a (rows, columns) float array, NaN marking missing values."""
+        values = np.asarray(values, dtype=np.float64)
+        present = ~np.isnan(values)
+        mask = present.astype(np.float64)
+        # shifting by the chunk means keeps the sums below small, so the subtractions stay exact
+        counts = mask.sum(axis=0)
+        shift = _divide(np.where(present, values, 0.0).sum(axis=0), counts)
+        shifted = np.where(present, values - shift, 0.0)
+        n = mask.T @ mask
+        sums = shifted.T @ mask
+        mean = _divide(sums, n)
+        m2 = (shifted * shifted).T @ mask - mean * sums
+        comoment = shifted.T @ shifted - mean * sums.T
+        return cls(columns, n, mean + shift[:, None], m2, comoment)
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        """State of the numeric (or the given) columns of a DataFrame."""
+        if columns is None:
+            columns = list(df.select_dtypes(include=["number", "bool"]).columns)
+        return cls.from_array(df[columns].to_numpy(dtype=np.float64, na_value=np.nan), columns)
+
+    def merge(self, other):
+        """Combine with the state of other rows of the same columns."""
+        if other.columns != self.columns:
+            raise ValueError("co-moments of different columns cannot be merged")
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        weight = _divide(self.n * other.n, n)
+        self.mean = self.mean + delta * _divide(other.n, n)
+        self.m2 = self.m2 + other.m2 + delta * delta * weight
+        self.comoment = self.comoment + other.comoment + delta * delta.T * weight
+        self.n = n
+        return self
+
+    def update(self, df):
+        """Add the rows of a DataFrame with these columns."""
+        return self.merge(CoMoments.from_frame(df, self.columns))
+
+    def covariance(self, ddof=1):
+        return pd.DataFrame(_divide(self.comoment, self.n - ddof), index=self.columns, columns=self.columns)
+
+    def pearson(self):
+        """Pearson correlation matrix, NaN for pairs without variance (as ``df.corr``)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = self.comoment / np.sqrt(self.m2 * self.m2.T)
+        corr[self.n < 2] = np.nan
+        return pd.DataFrame(np.clip(corr, -1.0, 1.0), index=self.columns, columns=self.columns)
+
+
+def _round_significant(values, digits):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        magnitude = np.floor(np.log10(np.abs(values)))
+    scale = 10.0 ** np.where(np.isfinite(magnitude), digits - 1 - magnitude, 0)
+    return np.round(values * scale) / scale
+
+
+class RankSketch:
+    """Mergeable value counts per column, with values rounded to ``digits`` significant digits.
+
+    The mid-rank of a value is read from the cumulative counts, so ranks are exact for
+    columns with few distinct values (counts, flags, days) and otherwise only tie the
+    values that round to the same bucket.
+
+    Parameters:
+    - counts: column -> Series of counts indexed by the sorted bucket values
+    - digits: significant digits kept per value
+    """
+
+    def __init__(self, counts=None, digits=DEFAULT_RANK_DIGITS):
+        self.counts = counts if counts is not None else {}
+        self.digits = digits
+
+    @classmethod
+    def from_frame(cls, df, columns, digits=DEFAULT_RANK_DIGITS):
+        counts = {}
+        for column in columns:
+            values = _round_significant(df[column].to_numpy(dtype=np.float64, na_value=np.nan), digits)
+            counts[column] = pd.Series(values).value_counts(dropna=True).sort_index()
+        return cls(counts, digits)
+
+    def merge(self, other):
+        for column, counts in other.counts.items():
+            current = self.counts.get(column)
+            self.counts[column] = counts if current is None else current.add(counts, fill_value=0).sort_index()
+        return self
+
+    def ranks(self, df):
+        """Approximate mid-ranks (as fractions of the column count) of the values of ``df``."""
+        ranked = {}
+        for column, counts in self.counts.items():
+            values = _round_significant(df[column].to_numpy(dtype=np.float64, na_value=np.nan), self.digits)
+            if counts.empty:
+                ranked[column] = np.full(len(values), np.nan)
+                continue
+            keys = counts.index.to_numpy()
+            cumulative = counts.to_numpy().cumsum()
+            mid_rank = (cumulative - (counts.to_numpy() - 1) / 2) / cumulative[-1]
+            position = np.clip(np.searchsorted(keys, values), 0, len(keys) - 1)
+            ranked[column] = np.where(np.isnan(values), np.nan, mid_rank[position])
+        return pd.DataFrame(ranked, index=df.index)
+
+
+def correlation_frame(df, method="pearson", columns=None, chunk_rows=DEFAULT_CHUNK_ROWS, max_workers=None):
+    """Correlation matrix of a DataFrame, computed over row chunks in parallel threads.
+
+    Parameters:
+    - df: DataFrame
+    - method: 'pearson' or 'spearman' (approximate ranks)
+    - columns: columns to correlate (default: numeric columns, as ``numeric_only=True``)
+    - chunk_rows: rows per chunk
+    - max_workers: number of threads (the matrix products release the GIL)
+
+    Returns:
+    - DataFrame
+    """
+    if columns is None:
+        columns = list(df.select_dtypes(include=["number", "bool"]).columns)
+    return correlation(lambda: row_chunks(df, chunk_rows), method=method, columns=columns, max_workers=max_workers)
+
+
+def correlation(chunks, method="pearson", columns=None, max_workers=None):
+    """Correlation matrix over chunks of rows that are never held in memory together.
+
+    Parameters:
+    - chunks: callable returning an iterable of DataFrames, e.g.
+      ``lambda: iter_booking_chunks(path)``; Spearman iterates it twice
+    - method: 'pearson' or 'spearman' (approximate ranks)
+    - columns: columns to correlate (default: numeric columns of the first chunk)
+    - max_workers: number of threads computing chunk states
+
+    Returns:
+    - DataFrame
+    """
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"unknown method {method!r}, expected one of {CORRELATION_METHODS}")
+
+    if columns is None:
+        first = next(iter(chunks()))
+        columns = list(first.select_dtypes(include=["number", "bool"]).columns)
+    if method == "spearman":
+        sketch = reduce_chunks(lambda chunk: RankSketch.from_frame(chunk, columns), chunks(), max_workers)
+        moments = reduce_chunks(lambda chunk: CoMoments.from_frame(sketch.ranks(chunk), columns), chunks(), max_workers)
+    else:
+        moments = reduce_chunks(lambda chunk: CoMoments.from_frame(chunk, columns), chunks(), max_workers)
+    return (moments or CoMoments.empty(columns)).pearson()
+
+
+def spark_correlation(sdf, columns, method="pearson"):
+    """Correlation matrix of Spark DataFrame columns, one state per partition merged on the driver.
+
+    Parameters:
+    - sdf: Spark DataFrame
+    - columns: numeric columns to correlate
+    - method: 'pearson' or 'spearman' (approximate ranks)
+
+    Returns:
+    - pandas DataFrame
+    """
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"unknown method {method!r}, expected one of {CORRELATION_METHODS}")
+    sdf = sdf.select(*columns)
+    if method == "spearman":
+        sketch = reduce_partitions(sdf, lambda batch: RankSketch.from_frame(batch, columns))
+        moments = reduce_partitions(sdf, lambda batch: CoMoments.from_frame(sketch.ranks(batch), columns))
+    else:
+        moments = reduce_partitions(sdf, lambda batch: CoMoments.from_frame(batch, columns))
+    return (moments or CoMoments.empty(columns)).pearson()
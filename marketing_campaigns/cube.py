@@ -0,0 +1,91 @@
+"""Booking counts, cancellation counts and cancellation rates per categorical value.
+
+The notebook answers every "ratio between X and cancelled" question with two
+boolean masks and two filtered copies of the frame. :func:`cancellation_cube`
+computes the counts of every value of every categorical column at once, from
+the integer codes of each column with ``np.bincount``, and returns a
+:class:`CancellationCube` that answers those questions by lookup.
+"""
+import numpy as np
+import pandas as pd
+
+CUBE_COLUMNS = [
+    "deposit_type",
+    "customer_type",
+    "meal",
+    "distribution_channel",
+    "reserved_room_type",
+    "assigned_room_type",
+    "hotel",
+    "arrival_date_month",
+]
+
+
+def _codes(values):
+    # categoricals already carry their codes; other columns are factorized once
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values)
+
+
+class CancellationCube:
+    """Queryable result of :func:`cancellation_cube`.
+
+    Parameters:
+    - table: DataFrame indexed by (dimension, value) with bookings, cancellations and rate
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    @property
+    def dimensions(self):
+        return list(self.table.index.unique(level="dimension"))
+
+    def breakdown(self, dimension):
+        """bookings/cancellations/rate of every value of ``dimension``, highest rate first."""
+        return self.table.loc[dimension].sort_values("rate", ascending=False)
+
+    def bookings(self, dimension, value):
+        return int(self.table.at[(dimension, value), "bookings"])
+
+    def cancellations(self, dimension, value):
+        return int(self.table.at[(dimension, value), "cancellations"])
+
+    def rate(self, dimension, value):
+        return float(self.table.at[(dimension, value), "rate"])
+
+
+def cancellation_cube(df, columns=None, target="is_canceled"):
+    """Count bookings and cancellations for every value of every categorical column.
+
+    Parameters:
+    - df: booking DataFrame
+    - columns: categorical columns to break down (default: those of CUBE_COLUMNS present in df)
+    - target: 0/1 cancellation column
+
+    Returns:
+    - CancellationCube
+    """
+    if columns is None:
+        columns = [c for c in CUBE_COLUMNS if c in df.columns]
+    canceled = df[target].to_numpy()
+    frames = []
+    for col in columns:
+        codes, values = _codes(df[col])
+        # rows with a missing value have code -1 and are left out, as in groupby
+        present = codes >= 0
+        if not present.all():
+            codes, weights = codes[present], canceled[present]
+        else:
+            weights = canceled
+        bookings = np.bincount(codes, minlength=len(values))
+        cancellations = np.bincount(codes, weights=weights, minlength=len(values)).astype(np.int64)
+        frames.append(pd.DataFrame({"dimension": col,
+                                    "value": np.asarray(values, dtype=object),
+                                    "bookings": bookings,
+                                    "cancellations": cancellations}))
+    table = pd.concat(frames, ignore_index=True)
+    # values that never occur (unused categories) stay in the table with a NaN rate
+    table["rate"] = table["cancellations"] / table["bookings"].where(table["bookings"] > 0)
+    return CancellationCube(table.set_index(["dimension", "value"]))
@@ -0,0 +1,410 @@
+"""Stage-DAG runner with checkpointed, content-hashed intermediate results.
+
+The notebook scripts are one linear sequence that mutates ``df`` and ``sdf``
+in place, so changing a model hyperparameter means rerunning ingest and EDA.
+Here the workflow is a set of named :class:`Stage` objects with declared
+inputs, outputs and parameters. Every stage gets a key from its code, its
+parameters and the content hashes of its inputs; its outputs are checkpointed
+under that key. A run only executes the stages whose key changed (and the
+checkpoints it needs are loaded lazily), and stages that don't depend on each
+other run in parallel.
+"""
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+import threading
+from functools import partial
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from marketing_campaigns.cache import file_digest, read_frame, write_frame
+from marketing_campaigns.instrument import frame_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_DIR = ".checkpoints"
+MANIFEST_FILE = "manifest.json"
+
+
+class Stage:
+    """One named step of the workflow.
+
+    Parameters:
+    - name: unique stage name
+    - func: callable receiving the inputs and params as keyword arguments and
+      returning the single output, or a tuple of the outputs in declared order
+    - inputs: names of the values the stage reads (outputs of other stages or run sources)
+    - outputs: names of the values the stage produces (default: the stage name)
+    - params: json-serializable parameters passed to ``func`` and part of the stage key
+    - options: keyword arguments passed to ``func`` that don't change its result
+      (e.g. a chunk size), left out of the stage key
+    - checkpoint: False for outputs that cannot be stored, e.g. Spark DataFrames;
+      such a stage re-executes whenever a later stage needs its outputs
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=None, params=None, options=None, checkpoint=True):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs) if outputs is not None else [name]
+        self.params = dict(params or {})
+        self.options = dict(options or {})
+        self.checkpoint = checkpoint
+
+    def code_hash(self):
+        try:
+            source = inspect.getsource(self.func)
+        except (OSError, TypeError):
+            source = f"{getattr(self.func, '__module__', '')}.{getattr(self.func, '__qualname__', repr(self.func))}"
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs})"
+
+
+def _hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def content_hash(value):
+    """Content hash of a stage output or a run source."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        columns = value.columns if isinstance(value, pd.DataFrame) else [value.name]
+        digest = hashlib.sha256(pickle.dumps([str(c) for c in columns]))
+        try:
+            digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        except TypeError:
+            # unhashable cells, e.g. the lists of the profile's Overview column
+            digest.update(pickle.dumps(value))
+        return digest.hexdigest()
+    if isinstance(value, str) and os.path.isfile(value):
+        return file_digest(value)
+    try:
+        return _hash_bytes(json.dumps(value, sort_keys=True).encode())
+    except TypeError:
+        return _hash_bytes(pickle.dumps(value))
+
+
+def _read_output(path):
+    if path.endswith(".arrow"):
+        return read_frame(path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class _Value:
+    """A stage output known by its hash; ``load`` produces it when a running stage first needs it."""
+
+    def __init__(self, digest, value=None, load=None):
+        self.digest = digest
+        self._value = value
+        self._load = load
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._load is not None:
+                self._value = self._load()
+                self._load = None
+        return self._value
+
+
+class _Deferred:
+    """Execution of a stage that is not checkpointed, run once when one of its outputs is read."""
+
+    def __init__(self, execute):
+        self._execute = execute
+        self._outputs = None
+        self._lock = threading.Lock()
+
+    def output(self, name):
+        with self._lock:
+            if self._outputs is None:
+                self._outputs = self._execute()
+        return self._outputs[name].get()
+
+
+class StageGraph:
+    """A DAG of stages with checkpointing.
+
+    Parameters:
+    - stages: list of Stage
+    - checkpoint_dir: directory of the checkpoints
+    - tracer: optional instrument.Tracer recording every executed stage
+    """
+
+    def __init__(self, stages, checkpoint_dir=DEFAULT_CHECKPOINT_DIR, tracer=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.checkpoint_dir = checkpoint_dir
+        self.tracer = tracer
+        self.producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"{output!r} is produced by both {self.producers[output]!r} and {stage.name!r}")
+                self.producers[output] = stage.name
+
+    def dependencies(self, name):
+        """Names of the stages whose outputs ``name`` reads."""
+        return {self.producers[i] for i in self.stages[name].inputs if i in self.producers}
+
+    def required(self, targets):
+        """All stages needed to produce ``targets`` (stage names)."""
+        needed, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.dependencies(name))
+        return needed
+
+    def _key(self, stage, values):
+        digest = hashlib.sha256()
+        digest.update(stage.name.encode())
+        digest.update(stage.code_hash().encode())
+        digest.update(json.dumps(stage.params, sort_keys=True, default=str).encode())
+        for name in stage.inputs:
+            digest.update(f"{name}={values[name].digest}".encode())
+        return digest.hexdigest()[:16]
+
+    def _checkpoint_path(self, stage, key):
+        return os.path.join(self.checkpoint_dir, stage.name, key)
+
+    def _load_checkpoint(self, stage, key):
+        manifest_path = os.path.join(self._checkpoint_path(stage, key), MANIFEST_FILE)
+        if not stage.checkpoint or not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        directory = self._checkpoint_path(stage, key)
+        return {output: _Value(entry["digest"], load=partial(_read_output, os.path.join(directory, entry["file"])))
+                for output, entry in manifest.items()}
+
+    def _save_checkpoint(self, stage, key, outputs):
+        directory = self._checkpoint_path(stage, key)
+        os.makedirs(directory, exist_ok=True)
+        manifest = {}
+        for output, value in outputs.items():
+            file_name = None
+            if isinstance(value.get(), pd.DataFrame):
+                try:
+                    # frames are stored as Arrow, which reads back faster than a pickle
+                    write_frame(value.get(), os.path.join(directory, f"{output}.arrow"))
+                    file_name = f"{output}.arrow"
+                except (TypeError, ValueError):
+                    # columns Arrow can't represent, e.g. mixed objects
+                    pass
+            if file_name is None:
+                file_name = f"{output}.pkl"
+                with open(os.path.join(directory, file_name), "wb") as f:
+                    pickle.dump(value.get(), f)
+            manifest[output] = {"file": file_name, "digest": value.digest}
+        # the manifest is written last, so an interrupted checkpoint is never picked up
+        with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    def _execute(self, stage, key, inputs, status):
+        kwargs = {name: value.get() for name, value in inputs.items()}
+        if self.tracer is None:
+            result = stage.func(**kwargs, **stage.params, **stage.options)
+        else:
+            counts = [n for n in map(frame_rows, kwargs.values()) if n is not None]
+            with self.tracer.stage(stage.name, rows_in=sum(counts) if counts else None) as record:
+                result = stage.func(**kwargs, **stage.params, **stage.options)
+                record.rows_out = frame_rows(result[0] if len(stage.outputs) > 1 else result)
+        results = result if len(stage.outputs) > 1 else (result,)
+        outputs = {}
+        for output, value in zip(stage.outputs, results):
+            # outputs that are not checkpointed are identified by the stage key instead of their content
+            digest = content_hash(value) if stage.checkpoint else f"{key}:{output}"
+            outputs[output] = _Value(digest, value=value)
+        if stage.checkpoint:
+            self._save_checkpoint(stage, key, outputs)
+        status[stage.name] = "ran"
+        logger.info("stage %s: executed", stage.name)
+        return outputs
+
+    def _defer(self, stage, key, inputs, status):
+        # the stage only runs if a stage reading its outputs has to run, e.g. Spark is not
+        # started when the models are checkpointed
+        deferred = _Deferred(partial(self._execute, stage, key, inputs, status))
+        status[stage.name] = "skipped"
+        return {output: _Value(f"{key}:{output}", load=partial(deferred.output, output)) for output in stage.outputs}
+
+    def run(self, sources, targets=None, max_workers=4, force=()):
+        """Run the stages needed for ``targets``, reusing every checkpoint whose key is unchanged.
+
+        Parameters:
+        - sources: name -> value of the inputs no stage produces (a file path is hashed by content)
+        - targets: stage names to produce (default: all stages)
+        - max_workers: number of stages running at the same time
+        - force: stage names to re-execute even when a checkpoint exists
+
+        Returns:
+        - dict with the outputs of the target stages and a "_status" entry: stage -> 'ran', 'cached'
+          or 'skipped' (a stage without checkpoint that nothing had to read)
+        """
+        targets = list(targets) if targets is not None else list(self.stages)
+        needed = self.required(targets)
+        values = {name: _Value(content_hash(value), value=value) for name, value in sources.items()}
+        missing = {i for n in needed for i in self.stages[n].inputs if i not in self.producers and i not in values}
+        if missing:
+            raise ValueError(f"missing sources: {sorted(missing)}")
+
+        status, done, running = {}, set(), {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while len(done) < len(needed):
+                for name in sorted(needed - done - set(running.values())):
+                    if not self.dependencies(name) <= done:
+                        continue
+                    stage = self.stages[name]
+                    key = self._key(stage, values)
+                    inputs = {i: values[i] for i in stage.inputs}
+                    cached = None if name in force else self._load_checkpoint(stage, key)
+                    if cached is not None:
+                        values.update(cached)
+                        status[name] = "cached"
+                        done.add(name)
+                        logger.info("stage %s: checkpoint %s", name, key)
+                    elif not stage.checkpoint and name not in targets and name not in force:
+                        values.update(self._defer(stage, key, inputs, status))
+                        done.add(name)
+                    else:
+                        running[pool.submit(self._execute, stage, key, inputs, status)] = name
+                if done >= needed:
+                    break
+                if not running:
+                    # stages are pending, but none can start and none is running
+                    if not any(self.dependencies(n) <= done for n in needed - done):
+                        raise ValueError(f"dependency cycle between {sorted(needed - done)}")
+                    continue
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    values.update(future.result())
+                    done.add(name)
+
+        results = {output: values[output].get() for name in targets for output in self.stages[name].outputs}
+        results["_status"] = status
+        return results
+
+
+# the booking workflow of the notebook scripts as stages
+
+def _load_stage(source, chunksize=None):
+    from marketing_campaigns.loader import load_bookings
+
+    return load_bookings(source, chunksize=chunksize)
+
+
+def _profile_stage(bookings):
+    from marketing_campaigns.profile import profile_frame
+
+    return profile_frame(bookings).summary()
+
+
+def _vocabulary_stage(bookings, saved_vocabulary):
+    from marketing_campaigns.encoding import Vocabulary
+
+    return Vocabulary(saved_vocabulary).extend(bookings)
+
+
+def _preprocess_stage(bookings, vocabulary, interpolation, outlier_mode):
+    from marketing_campaigns.preprocess import preprocess_bookings
+
+    df = preprocess_bookings(bookings, interpolation=interpolation, outlier_mode=outlier_mode)
+    # the checkpoint stores the categoricals with the stable codes
+    return vocabulary.encode(df, extend=False)
+
+
+def _cube_stage(preprocessed):
+    from marketing_campaigns.cube import cancellation_cube
+
+    return cancellation_cube(preprocessed)
+
+
+def _aggregates_stage(preprocessed):
+    from marketing_campaigns.heavy_hitters import HeavyHitters
+    from marketing_campaigns.incremental import CampaignAggregates
+
+    return CampaignAggregates.from_frame(preprocessed, heavy_hitters=HeavyHitters())
+
+
+def _eda_stage(preprocessed, bookings, out_dir):
+    from marketing_campaigns.report import eda_chart_jobs, render_report
+
+    results = render_report(eda_chart_jobs(preprocessed, reference=bookings), out_dir)
+    return {name: path for name, (path, _) in results.items()}
+
+
+def _spark_stage(preprocessed):
+    from marketing_campaigns.spark_io import create_spark_session, to_spark
+
+    sdf, _ = to_spark(create_spark_session(), preprocessed)
+    sdf.createOrReplaceTempView("hotels_booking")
+    return sdf
+
+
+def _features_stage(spark_bookings, preprocessed, vocabulary, model_dir):
+    from marketing_campaigns.encoding import VOCABULARY_FILE
+    from marketing_campaigns.featurize import feature_frame, fit_featurization, select_features
+
+    # written here rather than by the (checkpointed) vocabulary stage, so a checkpoint hit still saves it
+    vocabulary.save(os.path.join(model_dir, VOCABULARY_FILE))
+    sdf_cleaned = select_features(spark_bookings)
+    # the saved featurization is reused only if it was fitted on the same preprocessed rows
+    featurization = fit_featurization(sdf_cleaned, path=os.path.join(model_dir, "featurization"),
+                                      vocabulary=vocabulary, data={"preprocessed": content_hash(preprocessed)})
+    return featurization, feature_frame(featurization, sdf_cleaned)
+
+
+def _models_stage(featurization, features, model_dir, seed):
+    from marketing_campaigns.model_zoo import train_model_zoo
+    from marketing_campaigns.scorer import export_scorer
+
+    os.makedirs(model_dir, exist_ok=True)
+    train, test = features.randomSplit([0.8, 0.2], seed=seed)
+    zoo = train_model_zoo(train, test)
+    scorers = {name: export_scorer(featurization, model, os.path.join(model_dir, f"{name}_scorer.npz"))
+               for name, model in zoo.models.items()}
+    return zoo.comparison, scorers
+
+
+def booking_stages(interpolation="linear", outlier_mode="sequential", chunksize=None, report_dir="report",
+                   model_dir="models", seed=12345):
+    """Stages of the booking workflow, from the csv (the ``source`` input) to the trained models.
+
+    The ``saved_vocabulary`` input holds the labels saved by the previous training (see
+    :func:`booking_sources`); new labels are appended to them before preprocessing.
+
+    ``profile``, ``vocabulary``, ``cube``, ``aggregates`` and ``eda`` only need pandas;
+    ``spark_bookings`` and ``features`` hold Spark objects and are never checkpointed, so ``models`` starts
+    Spark only when its own key changed.
+    """
+    return [
+        Stage("bookings", _load_stage, inputs=["source"], options={"chunksize": chunksize}),
+        Stage("profile", _profile_stage, inputs=["bookings"]),
+        Stage("vocabulary", _vocabulary_stage, inputs=["bookings", "saved_vocabulary"]),
+        Stage("preprocessed", _preprocess_stage, inputs=["bookings", "vocabulary"],
+              params={"interpolation": interpolation, "outlier_mode": outlier_mode}),
+        Stage("cube", _cube_stage, inputs=["preprocessed"]),
+        Stage("aggregates", _aggregates_stage, inputs=["preprocessed"]),
+        Stage("eda", _eda_stage, inputs=["preprocessed", "bookings"], params={"out_dir": report_dir}),
+        Stage("spark_bookings", _spark_stage, inputs=["preprocessed"], checkpoint=False),
+        Stage("features", _features_stage, inputs=["spark_bookings", "preprocessed", "vocabulary"],
+              outputs=["featurization", "features"],
+              params={"model_dir": model_dir}, checkpoint=False),
+        Stage("models", _models_stage, inputs=["featurization", "features"], outputs=["comparison", "scorers"],
+              params={"model_dir": model_dir, "seed": seed}),
+    ]
+
+
+def booking_sources(path, model_dir="models"):
+    """Run sources of :func:`booking_stages`: the csv and the vocabulary saved in ``model_dir``."""
+    from marketing_campaigns.encoding import VOCABULARY_FILE, saved_labels
+
+    return {"source": path, "saved_vocabulary": saved_labels(os.path.join(model_dir, VOCABULARY_FILE))}
@@ -0,0 +1,134 @@
+"""Stable dictionary encoding of the categorical columns, shared by pandas and Spark.
+
+Every chunk, cache file and Spark fit used to number the string values on its
+own: pandas categoricals get the categories each chunk happens to contain, and
+the featurization fits one ``StringIndexer`` per column, a full pass each,
+whose ``*Index`` numbering changes whenever the value frequencies do. A
+:class:`Vocabulary` fixes the code of every value once -- by descending
+frequency on first sight, like ``StringIndexer``, with later values appended
+-- so codes never change across loads and retrains. pandas frames are encoded
+as categoricals with the vocabulary's categories (so ``.cat.codes`` are the
+stable codes, and Arrow cache files store them as dictionary indices), and the
+featurization builds its indexers with ``StringIndexerModel.from_labels``
+instead of fitting them.
+"""
+import json
+import os
+
+import pandas as pd
+
+from marketing_campaigns.cache import atomic_path
+from marketing_campaigns.schema import CATEGORICAL_COLUMNS
+
+VOCABULARY_FILE = "vocabulary.json"
+
+
+def _values(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        counts = series.value_counts(dropna=True)
+        counts = counts[counts > 0]
+    else:
+        counts = series.dropna().astype(str).value_counts()
+    # frequency descending, ties alphabetically: the StringIndexer order
+    order = sorted(zip(counts.index.astype(str), counts.tolist()), key=lambda item: (-item[1], item[0]))
+    return [label for label, _ in order]
+
+
+class Vocabulary:
+    """Append-only label lists of the categorical columns; a label's code is its position.
+
+    Parameters:
+    - labels: column -> list of labels
+    """
+
+    def __init__(self, labels=None):
+        self.labels = {column: list(values) for column, values in (labels or {}).items()}
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        """Vocabulary of the categorical columns of ``df`` (default: those of CATEGORICAL_COLUMNS present)."""
+        return cls().extend(df, columns)
+
+    @property
+    def columns(self):
+        return list(self.labels)
+
+    def extend(self, df, columns=None):
+        """Append the labels of ``df`` not seen yet; existing codes are left unchanged."""
+        if columns is None:
+            columns = [c for c in (self.columns or CATEGORICAL_COLUMNS) if c in df.columns]
+        for column in columns:
+            known = self.labels.setdefault(column, [])
+            seen = set(known)
+            known += [label for label in _values(df[column]) if label not in seen]
+        return self
+
+    def categories(self, column):
+        """CategoricalDtype whose codes are the stable codes of ``column``."""
+        return pd.CategoricalDtype(self.labels[column])
+
+    def encode(self, df, extend=True):
+        """``df`` with every vocabulary column as a categorical of the stable codes.
+
+        Parameters:
+        - df: DataFrame with (some of) the vocabulary columns, as strings or categoricals
+        - extend: first append labels not in the vocabulary; otherwise they become missing
+
+        Returns:
+        - new DataFrame (the other columns are not copied)
+        """
+        columns = [c for c in (self.columns or CATEGORICAL_COLUMNS) if c in df.columns]
+        if extend:
+            self.extend(df, columns)
+        else:
+            columns = [c for c in columns if c in self.labels]
+        encoded = {}
+        for column in columns:
+            values, dtype = df[column], self.categories(column)
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # recodes through the category mapping, without touching the strings of every row
+                encoded[column] = values.cat.set_categories(dtype.categories)
+            else:
+                encoded[column] = values.astype(str).where(values.notna()).astype(dtype)
+        return df.assign(**encoded)
+
+    def codes(self, df, column):
+        """Stable integer codes of a column of ``df`` (-1 for missing or unknown labels)."""
+        values = df[column]
+        if not (isinstance(values.dtype, pd.CategoricalDtype) and list(values.cat.categories) == self.labels[column]):
+            values = self.encode(df[[column]], extend=False)[column]
+        return values.cat.codes.to_numpy()
+
+    def string_indexers(self, columns=None, suffix="Index", handle_invalid="keep"):
+        """Fitted ``StringIndexerModel`` per column, built from the labels without a pass over the data.
+
+        With ``handle_invalid='keep'`` an unseen value gets the index ``len(labels)``, as with
+        a fitted StringIndexer.
+        """
+        from pyspark.ml.feature import StringIndexerModel
+
+        return [StringIndexerModel.from_labels(self.labels[column], inputCol=column, outputCol=column + suffix,
+                                               handleInvalid=handle_invalid)
+                for column in (columns if columns is not None else self.columns)]
+
+    def save(self, path):
+        with atomic_path(path) as tmp, open(tmp, "w") as f:
+            json.dump(self.labels, f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+
+def saved_labels(path):
+    """Labels of the vocabulary saved at ``path``, empty if there is none."""
+    return Vocabulary.load(path).labels if os.path.exists(path) else {}
+
+
+def update_vocabulary(path, df, columns=None):
+    """Load the vocabulary saved at ``path`` (empty if missing), extend it with ``df`` and save it back."""
+    vocabulary = Vocabulary.load(path) if os.path.exists(path) else Vocabulary()
+    vocabulary.extend(df, columns)
+    vocabulary.save(path)
+    return vocabulary
@@ -0,0 +1,138 @@
+"""Featurization of the cleaned Spark bookings for the cancellation models.
+
+The notebook fits one ``Pipeline`` for the ``StringIndexer`` stages and a second
+one for the ``VectorAssembler`` and transforms the frame twice. Here both are
+stages of a single ``PipelineModel`` that is fitted once, saved and reloaded
+on later runs, and the assembled ``feature_vector``/``label`` frame is
+persisted so the train/test split and every model read it without replaying
+the string indexing. The saved model carries a digest of the columns it was
+fitted on and of the caller's data parameters, and is refitted when they
+differ. Given an :class:`~marketing_campaigns.encoding.Vocabulary`,
+the indexers are built from its labels instead of being fitted, so the
+``*Index`` values are the same for every retrain.
+"""
+import hashlib
+import json
+import os
+
+from pyspark import StorageLevel
+from pyspark.ml import Pipeline, PipelineModel
+from pyspark.ml.feature import StringIndexer, VectorAssembler
+from pyspark.sql import functions as F
+
+LABEL_COLUMN = "is_canceled"
+FEATURES_COLUMN = "feature_vector"
+FINGERPRINT_FILE = "fingerprint.json"
+
+# remove some useless columns to the cancelation to get better results with the predictions (features selection)
+FEATURE_DROP_COLUMNS = [
+    "arrival_date_year",
+    "arrival_date_day_of_month",
+    "children",
+    "meal",
+    "agent",
+    "days_in_waiting_list",
+    "required_car_parking_spaces",
+]
+
+
+def select_features(sdf):
+    """Drop the columns that are not used as features."""
+    return sdf.drop(*FEATURE_DROP_COLUMNS)
+
+
+def feature_columns(sdf_cleaned):
+    """Split the columns of ``sdf_cleaned`` into (numerical, categorical), leaving out the label."""
+    numerical_columns = []
+    categorical_columns = []
+    for name, dtype in sdf_cleaned.dtypes:
+        if dtype == "string":
+            categorical_columns.append(name)
+        elif name != LABEL_COLUMN:
+            numerical_columns.append(name)
+    return numerical_columns, categorical_columns
+
+
+def build_featurization(numerical_columns, categorical_columns, vocabulary=None):
+    """One Pipeline with a StringIndexer per categorical column followed by the VectorAssembler.
+
+    Parameters:
+    - numerical_columns: columns assembled as they are
+    - categorical_columns: columns indexed into ``<column>Index`` before assembling
+    - vocabulary: encoding.Vocabulary; its columns get an already fitted StringIndexerModel
+
+    Returns:
+    - unfitted Pipeline
+    """
+    known = set(vocabulary.columns) if vocabulary is not None else set()
+    # 'keep' so that a reloaded model doesn't fail on a value first seen after it was fitted
+    stages = [vocabulary.string_indexers([col])[0] if col in known
+              else StringIndexer(inputCol=col, outputCol=col + "Index", handleInvalid="keep")
+              for col in categorical_columns]
+    assembler_inputs = list(numerical_columns) + [col + "Index" for col in categorical_columns]
+    stages.append(VectorAssembler(inputCols=assembler_inputs, outputCol=FEATURES_COLUMN))
+    return Pipeline(stages=stages)
+
+
+def featurization_fingerprint(sdf_cleaned, data=None):
+    """Digest of the columns (names and types) of ``sdf_cleaned`` and of the json-serializable ``data``."""
+    payload = json.dumps({"columns": sdf_cleaned.dtypes, "data": data}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _saved_fingerprint(path):
+    try:
+        with open(os.path.join(path, FINGERPRINT_FILE)) as f:
+            return json.load(f)["fingerprint"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def fit_featurization(sdf_cleaned, path=None, vocabulary=None, data=None):
+    """Fit the featurization PipelineModel on ``sdf_cleaned``, or reload it from ``path``.
+
+    Parameters:
+    - sdf_cleaned: Spark DataFrame holding only the feature columns and the label
+    - path: local directory of the saved model; fitted and saved there when missing or
+      when it was fitted on other columns or other ``data``
+    - vocabulary: encoding.Vocabulary of the categorical columns; with it no indexer is fitted
+      and the saved model is rebuilt on every call rather than reloaded
+    - data: json-serializable description of the input the model is fitted on, e.g. the
+      source digest and the preprocessing parameters
+
+    Returns:
+    - PipelineModel
+    """
+    fingerprint = featurization_fingerprint(sdf_cleaned, data)
+    # with a vocabulary the indexers are rebuilt from its current labels, which costs no pass,
+    # so labels appended since the model was saved get their own index
+    reload = vocabulary is None and path is not None and os.path.exists(path)
+    if reload and _saved_fingerprint(path) == fingerprint:
+        return PipelineModel.load(path)
+    model = build_featurization(*feature_columns(sdf_cleaned), vocabulary=vocabulary).fit(sdf_cleaned)
+    if path is not None:
+        model.write().overwrite().save(path)
+        # written after the model, so an interrupted save is refitted
+        with open(os.path.join(path, FINGERPRINT_FILE), "w") as f:
+            json.dump({"fingerprint": fingerprint, "data": data}, f, default=str)
+    return model
+
+
+def feature_frame(model, sdf_cleaned, storage_level=StorageLevel.MEMORY_AND_DISK):
+    """Transform ``sdf_cleaned`` once and persist the narrow frame the models need.
+
+    Parameters:
+    - model: fitted featurization PipelineModel
+    - sdf_cleaned: Spark DataFrame holding the feature columns and the label
+    - storage_level: storage level of the persisted frame
+
+    Returns:
+    - persisted Spark DataFrame with feature_vector, label and is_canceled
+    """
+    features = model.transform(sdf_cleaned).select(
+        FEATURES_COLUMN,
+        # add column named 'label' is the same as 'is_canceled' column as the crossvalidator needs it
+        F.col(LABEL_COLUMN).alias("label"),
+        LABEL_COLUMN,
+    )
+    return features.persist(storage_level)
@@ -0,0 +1,134 @@
+"""Streaming heavy hitters of the agent and country columns.
+
+The "most repeated agencies" query groups the whole history by agent to keep
+five rows, and country gets the same treatment in EDA. A Space-Saving summary
+keeps at most ``capacity`` counters per column; every batch of bookings is
+counted exactly, turned into a summary of its own and merged in, so the state
+stays the same size however many bookings are ingested. Counts are upper
+bounds with a known error: an item's true count lies in ``[count - error, count]``
+and every item more frequent than ``total / capacity`` is tracked.
+
+Merging follows Cafaro et al.: an item missing from a summary is taken at that
+summary's floor (the largest count it may have dropped), counts and errors add
+up, and the ``capacity`` largest counters are kept.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CAPACITY = 256
+HEAVY_HITTER_COLUMNS = ("agent", "country")
+SCOPES = ("all", "kept")
+
+
+class SpaceSaving:
+    """Mergeable Space-Saving summary of the most frequent items.
+
+    Parameters:
+    - capacity: number of counters kept
+    - counts: item -> estimated count (an upper bound)
+    - errors: item -> overestimation bound of its count
+    - floor: upper bound of the count of any item without a counter
+    - total: number of items summarized
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, counts=None, errors=None, floor=0, total=0):
+        self.capacity = capacity
+        self.counts = counts if counts is not None else {}
+        self.errors = errors if errors is not None else {}
+        self.floor = floor
+        self.total = total
+
+    @classmethod
+    def from_counts(cls, counts, capacity=DEFAULT_CAPACITY):
+        """Summary of exact counts (a Series or dict item -> count); only the largest ``capacity`` are kept."""
+        counts = pd.Series(counts, dtype=np.int64)
+        counts = counts[counts > 0].sort_values(ascending=False, kind="stable")
+        floor = int(counts.iloc[capacity]) if len(counts) > capacity else 0
+        kept = counts.iloc[:capacity]
+        return cls(capacity, dict(zip(kept.index, kept.tolist())), dict.fromkeys(kept.index, 0), floor,
+                   int(counts.sum()))
+
+    @classmethod
+    def from_values(cls, values, capacity=DEFAULT_CAPACITY):
+        """Summary of a Series of items; missing values are left out."""
+        return cls.from_counts(values.value_counts(dropna=True), capacity)
+
+    def merge(self, other):
+        """Combine with the summary of other items."""
+        capacity = max(self.capacity, other.capacity)
+        counts, errors = {}, {}
+        for item in self.counts.keys() | other.counts.keys():
+            counts[item] = self.counts.get(item, self.floor) + other.counts.get(item, other.floor)
+            errors[item] = self.errors.get(item, self.floor) + other.errors.get(item, other.floor)
+        floor = self.floor + other.floor
+        if len(counts) > capacity:
+            ranked = sorted(counts, key=counts.get, reverse=True)
+            floor = max(floor, counts[ranked[capacity]])
+            counts = {item: counts[item] for item in ranked[:capacity]}
+            errors = {item: errors[item] for item in counts}
+        self.capacity, self.counts, self.errors, self.floor = capacity, counts, errors, floor
+        self.total += other.total
+        return self
+
+    def update(self, values):
+        """Add a Series of items."""
+        return self.merge(SpaceSaving.from_values(values, self.capacity))
+
+    def top(self, n=5):
+        """The ``n`` items with the largest counts.
+
+        Returns:
+        - DataFrame indexed by item with the estimated ``count`` (upper bound), its
+          ``error``, the ``guaranteed`` lower bound and ``exact_rank``, True when the item
+          is certainly among the top ``n``
+        """
+        table = pd.DataFrame({"count": pd.Series(self.counts, dtype=np.int64),
+                              "error": pd.Series(self.errors, dtype=np.int64)})
+        table = table.sort_values("count", ascending=False, kind="stable")
+        table["guaranteed"] = table["count"] - table["error"]
+        # the (n+1)-th count bounds every item outside the top n
+        runner_up = table["count"].iloc[n] if len(table) > n else self.floor
+        top = table.head(n).copy()
+        top["exact_rank"] = top["guaranteed"] >= max(runner_up, self.floor)
+        return top
+
+
+class HeavyHitters:
+    """Space-Saving summaries of several columns, over all bookings and over the non-cancelled ones.
+
+    Parameters:
+    - columns: columns to track
+    - capacity: counters per column and scope
+    """
+
+    def __init__(self, columns=HEAVY_HITTER_COLUMNS, capacity=DEFAULT_CAPACITY):
+        self.columns = list(columns)
+        self.capacity = capacity
+        self.summaries = {(column, scope): SpaceSaving(capacity) for column in self.columns for scope in SCOPES}
+
+    @classmethod
+    def from_frame(cls, df, columns=HEAVY_HITTER_COLUMNS, capacity=DEFAULT_CAPACITY):
+        return cls(columns, capacity).update(df)
+
+    def update(self, df, target="is_canceled"):
+        """Add the bookings of ``df``; each column is counted once per scope with a value_counts."""
+        kept = df.loc[df[target].to_numpy() == 0, self.columns] if target in df.columns else None
+        for column in self.columns:
+            self.summaries[(column, "all")].update(df[column])
+            if kept is not None:
+                self.summaries[(column, "kept")].update(kept[column])
+        return self
+
+    def merge(self, other):
+        """Combine with the summaries of other bookings; ``other`` is left unchanged."""
+        for key, summary in other.summaries.items():
+            current = self.summaries.get(key)
+            # a copy, or later updates of self would also change other
+            self.summaries[key] = copy.deepcopy(summary) if current is None else current.merge(summary)
+        return self
+
+    def top(self, column, n=5, kept_only=False):
+        """Most frequent values of ``column``, over the non-cancelled bookings if ``kept_only``."""
+        return self.summaries[(column, "kept" if kept_only else "all")].top(n)
@@ -0,0 +1,239 @@
+"""Incrementally maintained campaign aggregates.
+
+The monthly revenue, agent booking counts, least-booked room types and
+weekend ADR averages are recomputed from the whole history whenever a new day
+of bookings arrives. :class:`CampaignAggregates` keeps them as mergeable state --
+count, sum and sum of squares per group -- so a new file only has to be
+aggregated on its own and added to the state; the insights are then derived
+from the few group rows. Optional quantile sketches of the outlier columns
+follow every ingested row, so the IQR bounds can be refreshed without
+re-reading the history, and optional Space-Saving summaries answer the top
+agents and countries in constant memory.
+"""
+import copy
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from marketing_campaigns.cache import file_digest, read_frame, write_frame
+from marketing_campaigns.loader import iter_booking_chunks
+from marketing_campaigns.heavy_hitters import HeavyHitters
+from marketing_campaigns.outliers import iqr_bounds_chunks, outlier_mask
+from marketing_campaigns.preprocess import add_revenue
+from marketing_campaigns.schema import OUTLIER_COLUMNS
+from marketing_campaigns.sketches import ColumnSketches
+
+# name: (group column, only non-cancelled bookings, measures with sum/sum of squares)
+AGGREGATE_SPECS = {
+    "month": ("arrival_date_month", True, ["adr", "revenue"]),
+    "agent": ("agent", True, []),
+    "room": ("reserved_room_type", True, []),
+    "weekend_nights": ("stays_in_weekend_nights", False, ["adr"]),
+}
+
+STATE_FILE = "state.json"
+SKETCHES_FILE = "sketches.pkl"
+HEAVY_HITTERS_FILE = "heavy_hitters.pkl"
+
+
+def _partial(df, column, kept_only, measures):
+    if kept_only:
+        df = df[df["is_canceled"] == 0]
+    values = {"count": np.ones(len(df), dtype=np.int64)}
+    for measure in measures:
+        x = df[measure].to_numpy(dtype=np.float64)
+        values[f"sum_{measure}"] = x
+        values[f"sumsq_{measure}"] = x * x
+    frame = pd.DataFrame(values, index=df.index)
+    # NaN groups (e.g. bookings without an agent) are left out, like the notebook's isnan(agent)=0
+    return frame.groupby(df[column].to_numpy(), dropna=True).sum()
+
+
+def _add(current, partial):
+    if current is None:
+        return partial
+    # add(fill_value=0) goes through float64 for the groups missing on one side
+    return current.add(partial, fill_value=0).astype({"count": np.int64})
+
+
+class CampaignAggregates:
+    """Mergeable per-group counts, sums and sums of squares behind the campaign insights.
+
+    Parameters:
+    - tables: name -> DataFrame of the AGGREGATE_SPECS groups (empty when omitted)
+    - bounds: IQR bounds applied to every ingested file (from the initial build), or None
+    - ingested: digests of the files already added to the state
+    - sketches: sketches.ColumnSketches fed with every ingested row before filtering, or None
+    - heavy_hitters: heavy_hitters.HeavyHitters updated with the aggregated rows, or None
+    """
+
+    def __init__(self, tables=None, bounds=None, ingested=None, sketches=None, heavy_hitters=None):
+        self.tables = tables if tables is not None else {}
+        self.bounds = bounds
+        self.ingested = list(ingested or [])
+        self.sketches = sketches
+        self.heavy_hitters = heavy_hitters
+
+    @classmethod
+    def from_frame(cls, df, bounds=None, sketches=None, heavy_hitters=None):
+        """Build the state from a preprocessed booking frame (with ``revenue``).
+
+        ``sketches`` should already hold the rows of ``df`` before the outlier filter;
+        ``heavy_hitters`` (e.g. an empty HeavyHitters()) is filled with ``df``.
+        """
+        aggregates = cls(bounds=bounds, sketches=sketches, heavy_hitters=heavy_hitters)
+        aggregates.update(df)
+        return aggregates
+
+    def update(self, df):
+        """Add the bookings of ``df`` (preprocessed, with ``revenue``) to the state."""
+        for name, (column, kept_only, measures) in AGGREGATE_SPECS.items():
+            self.tables[name] = _add(self.tables.get(name), _partial(df, column, kept_only, measures))
+        if self.heavy_hitters is not None:
+            self.heavy_hitters.update(df)
+        return self
+
+    def merge(self, other):
+        """Combine with the state of another set of bookings, e.g. built in parallel."""
+        for name, table in other.tables.items():
+            self.tables[name] = _add(self.tables.get(name), table)
+        self.ingested += [digest for digest in other.ingested if digest not in self.ingested]
+        if other.sketches is not None:
+            self.sketches = (copy.deepcopy(other.sketches) if self.sketches is None
+                             else self.sketches.merge(other.sketches))
+        if other.heavy_hitters is not None:
+            # copied, so that updating self never changes other's summaries
+            self.heavy_hitters = (copy.deepcopy(other.heavy_hitters) if self.heavy_hitters is None
+                                  else self.heavy_hitters.merge(other.heavy_hitters))
+        return self
+
+    def refresh_bounds(self, k=1.5, interpolation="linear"):
+        """Recompute the IQR bounds of later ingests from the sketches of all rows seen so far.
+
+        Rows already in the tables keep the filter they were aggregated with.
+        """
+        if self.sketches is None:
+            raise ValueError("the aggregates keep no sketches to compute bounds from")
+        self.bounds = self.sketches.iqr_bounds(k=k, interpolation=interpolation)
+        return self.bounds
+
+    def ingest(self, path, chunksize=None):
+        """Append a new booking csv: only its rows are parsed, cleaned and aggregated.
+
+        A file whose content was already ingested is skipped.
+
+        Parameters:
+        - path: csv with the new bookings, same schema as egphotelbookings.csv
+        - chunksize: rows parsed per chunk (default: loader default)
+
+        Returns:
+        - True if the file was added, False if it had already been ingested
+        """
+        digest = file_digest(path)
+        if digest in self.ingested:
+            return False
+        kwargs = {} if chunksize is None else {"chunksize": chunksize}
+        for chunk in iter_booking_chunks(path, clean=True, **kwargs):
+            if self.sketches is not None:
+                self.sketches.update(chunk)
+            if self.bounds is not None:
+                # the bounds of the initial build are kept, so old rows never need re-filtering
+                chunk = chunk[outlier_mask(chunk, self.bounds)]
+            self.update(add_revenue(chunk))
+        self.ingested.append(digest)
+        return True
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, table in self.tables.items():
+            write_frame(table.rename_axis("group").reset_index(), os.path.join(directory, f"{name}.arrow"))
+        if self.bounds is not None:
+            write_frame(self.bounds.rename_axis("column").reset_index(), os.path.join(directory, "bounds.arrow"))
+        for state, file in ((self.sketches, SKETCHES_FILE), (self.heavy_hitters, HEAVY_HITTERS_FILE)):
+            if state is not None:
+                with open(os.path.join(directory, file), "wb") as f:
+                    pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(os.path.join(directory, STATE_FILE), "w") as f:
+            json.dump({"tables": list(self.tables), "bounds": self.bounds is not None,
+                       "sketches": self.sketches is not None, "heavy_hitters": self.heavy_hitters is not None,
+                       "ingested": self.ingested}, f)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, STATE_FILE)) as f:
+            state = json.load(f)
+        tables = {name: read_frame(os.path.join(directory, f"{name}.arrow")).set_index("group")
+                  for name in state["tables"]}
+        bounds = None
+        if state["bounds"]:
+            bounds = read_frame(os.path.join(directory, "bounds.arrow")).set_index("column")
+        pickled = {}
+        for key, file in (("sketches", SKETCHES_FILE), ("heavy_hitters", HEAVY_HITTERS_FILE)):
+            if state.get(key):
+                with open(os.path.join(directory, file), "rb") as f:
+                    pickled[key] = pickle.load(f)
+        return cls(tables, bounds, state["ingested"], **pickled)
+
+    # insights, derived from the group rows only
+
+    def top_agents(self, n=5):
+        """Agencies with the most non-cancelled bookings."""
+        return self.tables["agent"]["count"].nlargest(n).rename("numberOfBookings")
+
+    def top_hitters(self, column="agent", n=5, kept_only=True):
+        """Most frequent values of a heavy-hitter column from the Space-Saving summaries (see HeavyHitters.top)."""
+        if self.heavy_hitters is None:
+            raise ValueError("the aggregates keep no heavy-hitter summaries")
+        return self.heavy_hitters.top(column, n, kept_only=kept_only)
+
+    def least_booked_rooms(self):
+        """Non-cancelled bookings per reserved room type, least booked first."""
+        return self.tables["room"]["count"].sort_values().rename("counter")
+
+    def monthly_adr(self):
+        """Average adr of the non-cancelled bookings per month, highest first."""
+        month = self.tables["month"]
+        return (month["sum_adr"] / month["count"]).sort_values(ascending=False).rename("avg_price")
+
+    def monthly_revenue(self):
+        """Total revenue of the non-cancelled bookings per month, highest first."""
+        return self.tables["month"]["sum_revenue"].sort_values(ascending=False).rename("Total_revenue")
+
+    def weekend_adr(self, n=5):
+        """Mean and standard deviation of adr per number of weekend nights, highest mean first."""
+        weekend = self.tables["weekend_nights"]
+        count = weekend["count"]
+        mean = weekend["sum_adr"] / count
+        # sample variance from the running sums
+        variance = (weekend["sumsq_adr"] - count * mean ** 2) / (count - 1).where(count > 1)
+        stats = pd.DataFrame({"AVG_adr": mean, "std_adr": np.sqrt(variance.clip(lower=0)), "bookings": count})
+        return stats.sort_values("AVG_adr", ascending=False).head(n)
+
+
+def ingest_files(state_dir, paths, chunksize=None):
+    """Add new booking files to the aggregates saved in ``state_dir`` and save them back.
+
+    Without a saved state, one is started with the joint IQR bounds of the first file
+    (from quantile sketches), sketches of the outlier columns and heavy-hitter summaries.
+
+    Parameters:
+    - state_dir: directory written by CampaignAggregates.save
+    - paths: booking csv files, same schema as egphotelbookings.csv
+    - chunksize: rows parsed per chunk (default: loader default)
+
+    Returns:
+    - (CampaignAggregates, list of the paths that were added rather than skipped as already ingested)
+    """
+    kwargs = {} if chunksize is None else {"chunksize": chunksize}
+    if os.path.exists(os.path.join(state_dir, STATE_FILE)):
+        aggregates = CampaignAggregates.load(state_dir)
+    else:
+        bounds = iqr_bounds_chunks(iter_booking_chunks(paths[0], clean=True, **kwargs), OUTLIER_COLUMNS)
+        aggregates = CampaignAggregates(bounds=bounds, sketches=ColumnSketches(OUTLIER_COLUMNS),
+                                        heavy_hitters=HeavyHitters())
+    added = [path for path in paths if aggregates.ingest(path, chunksize=chunksize)]
+    aggregates.save(state_dir)
+    return aggregates, added
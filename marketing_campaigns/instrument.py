@@ -0,0 +1,214 @@
+"""Per-stage timings, memory and Spark job metrics.
+
+A slow run doesn't tell whether the time went to parsing the csv,
+``createDataFrame``, a campaign query, the cross-validation or a ``toPandas``
+collect. :class:`Tracer` wraps each stage and records wall and CPU time, optionally the
+peak of Python allocations (``tracemalloc``), rows in and out and, when a
+SparkContext is active, the Spark jobs and stages the stage launched with
+their shuffle and spill bytes. A run is written as a JSON trace and printed as
+a summary table.
+
+The Spark side relies on job groups: every stage runs its jobs in a group of
+its own, which the status tracker maps to job and stage ids; the per-stage
+shuffle and spill figures come from the monitoring REST API of the Spark UI.
+The group is a thread-local property, so code that launches jobs from a thread
+pool wraps its tasks with :func:`propagate_job_group`.
+"""
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from urllib.error import URLError
+from urllib.request import urlopen
+
+logger = logging.getLogger(__name__)
+
+JOB_GROUP_PROPERTY = "spark.jobGroup.id"
+JOB_DESCRIPTION_PROPERTY = "spark.job.description"
+
+# REST API field -> trace field, summed over the stage attempts
+SPARK_STAGE_FIELDS = {
+    "executorRunTime": "executor_run_ms",
+    "executorCpuTime": "executor_cpu_ns",
+    "inputBytes": "input_bytes",
+    "shuffleReadBytes": "shuffle_read_bytes",
+    "shuffleWriteBytes": "shuffle_write_bytes",
+    "memoryBytesSpilled": "memory_spill_bytes",
+    "diskBytesSpilled": "disk_spill_bytes",
+}
+
+
+def _active_spark_context():
+    # only look for a context if pyspark is already loaded; tracing must not import it
+    pyspark = sys.modules.get("pyspark")
+    return None if pyspark is None else pyspark.SparkContext._active_spark_context
+
+
+def _rest_stage(sc, stage_id):
+    if not sc.uiWebUrl:
+        return []
+    url = f"{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}/stages/{stage_id}"
+    try:
+        with urlopen(url, timeout=5) as response:
+            return json.load(response)
+    except (URLError, OSError, ValueError) as e:
+        logger.warning("no metrics for Spark stage %s: %s", stage_id, e)
+        return []
+
+
+def propagate_job_group(func, sc=None):
+    """Wrap ``func`` to run with the job group of the calling thread, e.g. for ``pool.submit``.
+
+    Spark keeps the job group in thread-local properties that pool threads don't inherit, so
+    without this the jobs of a concurrent fit are attributed to no traced stage.
+    """
+    sc = sc or _active_spark_context()
+    if sc is None:
+        return func
+    properties = {name: sc.getLocalProperty(name) for name in (JOB_GROUP_PROPERTY, JOB_DESCRIPTION_PROPERTY)}
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        previous = {name: sc.getLocalProperty(name) for name in properties}
+        for name, value in properties.items():
+            sc.setLocalProperty(name, value)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            for name, value in previous.items():
+                sc.setLocalProperty(name, value)
+    return run
+
+
+def spark_group_metrics(sc, group):
+    """Jobs, stages, shuffle and spill of the jobs run in job group ``group``."""
+    tracker = sc.statusTracker()
+    job_ids = list(tracker.getJobIdsForGroup(group))
+    stage_ids = set()
+    for job_id in job_ids:
+        info = tracker.getJobInfo(job_id)
+        if info is not None:
+            stage_ids.update(info.stageIds)
+    metrics = {"jobs": len(job_ids), "stages": len(stage_ids), **{name: 0 for name in SPARK_STAGE_FIELDS.values()}}
+    for stage_id in sorted(stage_ids):
+        for attempt in _rest_stage(sc, stage_id):
+            for field, name in SPARK_STAGE_FIELDS.items():
+                metrics[name] += attempt.get(field, 0)
+    return metrics
+
+
+class StageRecord:
+    """Measurements of one traced stage; set ``rows_out`` inside the ``with`` block."""
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.started = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.python_peak_mb = None
+        self.spark = None
+        self.error = None
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class Tracer:
+    """Collects a StageRecord per traced stage of a run.
+
+    Parameters:
+    - spark_context: SparkContext whose jobs are attributed to the stages
+      (default: the active one, if pyspark is loaded)
+    - memory: trace Python allocations with tracemalloc; off by default as it slows
+      allocation-heavy stages down several times, and the peak is process-wide, so
+      stages running at the same time share it
+
+    ``cpu_seconds`` is the CPU time of the Python process; the executors' CPU time is
+    in the Spark metrics.
+    """
+
+    def __init__(self, spark_context=None, memory=False):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.spark_context = spark_context
+        self.memory = memory
+        self.records = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Trace the block as stage ``name``; yields its StageRecord."""
+        record = StageRecord(name, rows_in)
+        sc = self.spark_context or _active_spark_context()
+        group = previous_group = previous_description = None
+        if sc is not None:
+            group = f"{self.run_id}-{name}-{uuid.uuid4().hex[:6]}"
+            previous_group = sc.getLocalProperty(JOB_GROUP_PROPERTY)
+            previous_description = sc.getLocalProperty(JOB_DESCRIPTION_PROPERTY)
+            sc.setJobGroup(group, name)
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            start_memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        record.started = time.time()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        except BaseException as e:
+            record.error = repr(e)
+            raise
+        finally:
+            record.wall_seconds = time.perf_counter() - wall
+            record.cpu_seconds = time.process_time() - cpu
+            if self.memory:
+                record.python_peak_mb = max(tracemalloc.get_traced_memory()[1] - start_memory, 0) / 2 ** 20
+            if sc is not None:
+                # a nested stage hands the job group back to the enclosing one
+                if previous_group is not None:
+                    sc.setJobGroup(previous_group, previous_description)
+                else:
+                    sc.setLocalProperty(JOB_GROUP_PROPERTY, None)
+                    sc.setLocalProperty(JOB_DESCRIPTION_PROPERTY, None)
+                record.spark = spark_group_metrics(sc, group)
+            with self._lock:
+                self.records.append(record)
+            logger.info("stage %s: %.2fs wall, %.2fs cpu", name, record.wall_seconds, record.cpu_seconds)
+
+    def to_dict(self):
+        return {"run_id": self.run_id, "started": self.started, "stages": [r.to_dict() for r in self.records]}
+
+    def to_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self):
+        """One row per stage in start order: times, memory, rows and the Spark figures in MB."""
+        import pandas as pd
+
+        rows = []
+        for record in sorted(self.records, key=lambda r: r.started):
+            row = {"stage": record.name, "wall_s": record.wall_seconds, "cpu_s": record.cpu_seconds,
+                   "py_peak_mb": record.python_peak_mb, "rows_in": record.rows_in, "rows_out": record.rows_out}
+            if record.spark is not None:
+                spark = record.spark
+                row.update({"jobs": spark["jobs"], "spark_stages": spark["stages"],
+                            "shuffle_read_mb": spark["shuffle_read_bytes"] / 2 ** 20,
+                            "shuffle_write_mb": spark["shuffle_write_bytes"] / 2 ** 20,
+                            "spill_mb": (spark["memory_spill_bytes"] + spark["disk_spill_bytes"]) / 2 ** 20})
+            rows.append(row)
+        return pd.DataFrame(rows).set_index("stage") if rows else pd.DataFrame()
+
+
+def frame_rows(value):
+    """Row count of a pandas frame or series, None for anything else (a Spark count would start a job)."""
+    import pandas as pd
+
+    return len(value) if isinstance(value, (pd.DataFrame, pd.Series)) else None
@@ -0,0 +1,103 @@
+"""Typed loading of ``egphotelbookings.csv``.
+
+``pd.read_csv`` without a schema turns every string column into Python objects
+and every count into int64/float64. The loaders here parse straight into the
+compact dtypes of :data:`marketing_campaigns.schema.BOOKING_DTYPES` and can
+stream the file in chunks so that the raw frame never has to fit in memory.
+"""
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from marketing_campaigns.schema import BOOKING_DTYPES, DROP_COLUMNS, DROPNA_SUBSET
+
+DEFAULT_CHUNKSIZE = 250_000
+
+
+def clean_bookings(df):
+    """Apply Data Preprocessing Part-1 without mutating the input.
+
+    Parameters:
+    - df: raw booking DataFrame
+
+    Returns:
+    - DataFrame without the dropped columns and without rows missing country/children
+    """
+    df = df.drop(columns=[c for c in DROP_COLUMNS if c in df.columns])
+    return df.dropna(subset=DROPNA_SUBSET)
+
+
+def _read_csv(path, clean, **kwargs):
+    # dropped columns are skipped by the parser itself, so they never get materialized
+    usecols = (lambda c: c not in DROP_COLUMNS) if clean else None
+    return pd.read_csv(path, dtype=BOOKING_DTYPES, usecols=usecols, **kwargs)
+
+
+def iter_booking_chunks(path, chunksize=DEFAULT_CHUNKSIZE, clean=True, vocabulary=None):
+    """Stream the booking file as typed DataFrame chunks.
+
+    Parameters:
+    - path: path of the booking csv
+    - chunksize: number of raw rows parsed per chunk
+    - clean: drop the unused columns and the rows missing country/children in every chunk
+    - vocabulary: encoding.Vocabulary; every chunk's categoricals get its stable codes
+      (and new labels are appended to it)
+
+    Returns:
+    - generator of DataFrames; the index keeps the row numbers of the file
+    """
+    with _read_csv(path, clean, chunksize=chunksize) as reader:
+        for chunk in reader:
+            if clean:
+                chunk = chunk.dropna(subset=DROPNA_SUBSET)
+            yield chunk if vocabulary is None else vocabulary.encode(chunk)
+
+
+def concat_chunks(chunks, columns=None):
+    """Concatenate typed chunks without falling back to object columns.
+
+    Every chunk has its own categories, and a plain ``pd.concat`` of categoricals
+    with different categories produces an object column. The categories are
+    unioned first and every chunk is recoded onto them.
+
+    Parameters:
+    - chunks: iterable of DataFrames produced by :func:`iter_booking_chunks`
+    - columns: columns of the frame returned when there are no chunks (default: all of BOOKING_DTYPES)
+
+    Returns:
+    - one DataFrame; an empty typed frame when there are no chunks, e.g. for a file
+      with only a header
+    """
+    chunks = list(chunks)
+    if not chunks:
+        columns = list(BOOKING_DTYPES) if columns is None else columns
+        return pd.DataFrame({column: pd.Series(dtype=BOOKING_DTYPES[column]) for column in columns})
+    if len(chunks) == 1:
+        return chunks[0]
+    categorical = [c for c, t in chunks[0].dtypes.items() if isinstance(t, pd.CategoricalDtype)]
+    for col in categorical:
+        categories = union_categoricals([chunk[col] for chunk in chunks]).categories
+        for chunk in chunks:
+            chunk[col] = chunk[col].cat.set_categories(categories)
+    return pd.concat(chunks)
+
+
+def load_bookings(path, clean=False, chunksize=None, vocabulary=None):
+    """Load the booking file with the explicit schema.
+
+    Parameters:
+    - path: path of the booking csv
+    - clean: apply Data Preprocessing Part-1 while loading
+    - chunksize: parse the file in chunks of this many rows to bound peak memory
+    - vocabulary: encoding.Vocabulary giving the categoricals their stable codes
+
+    Returns:
+    - typed DataFrame
+    """
+    if chunksize is None:
+        df = _read_csv(path, clean)
+        if clean:
+            df = df.dropna(subset=DROPNA_SUBSET)
+        return df if vocabulary is None else vocabulary.encode(df)
+    # chunks encoded with one vocabulary have the same categories, so concat_chunks has nothing to union
+    columns = [c for c in BOOKING_DTYPES if c not in DROP_COLUMNS] if clean else None
+    return concat_chunks(iter_booking_chunks(path, chunksize=chunksize, clean=clean, vocabulary=vocabulary), columns)
@@ -0,0 +1,152 @@
+"""Loyalty ranking and loyal-customer counts without full sorts or frame copies.
+
+The loyalty insight selects every column of every booking, computes
+``previous_cancellations - previous_bookings_not_canceled`` and sorts the
+candidates to keep five of them; the loyal-customer count copies the matching
+rows just to take their ``len``. Here the score is computed from the two
+columns only, the ``k`` best bookings are picked with an ``np.partition`` (or,
+in Spark, a partial top-k per partition merged on the driver) and returned as
+booking index labels, so the full rows are only looked up for the winners.
+"""
+import heapq
+
+import numpy as np
+import pandas as pd
+
+SCORE_COLUMNS = ["previous_cancellations", "previous_bookings_not_canceled"]
+SCORE_NAME = "loyality"
+# the loyalty insight keeps bookings with a score above this
+DEFAULT_THRESHOLD = 1
+
+
+def loyalty_score(df):
+    """``previous_cancellations - previous_bookings_not_canceled`` as an int32 array."""
+    cancellations = df[SCORE_COLUMNS[0]].to_numpy(dtype=np.int32)
+    return cancellations - df[SCORE_COLUMNS[1]].to_numpy(dtype=np.int32)
+
+
+def loyal_customer_mask(df, min_not_canceled=3, max_cancellations=0):
+    """True for the bookings of loyal customers: more than ``min_not_canceled`` kept previous bookings
+    and at most ``max_cancellations`` previous cancellations."""
+    return ((df["previous_bookings_not_canceled"].to_numpy() > min_not_canceled)
+            & (df["previous_cancellations"].to_numpy() <= max_cancellations))
+
+
+def count_loyal_customers(df, min_not_canceled=3, max_cancellations=0):
+    """Number of loyal-customer bookings, without materializing them."""
+    return int(np.count_nonzero(loyal_customer_mask(df, min_not_canceled, max_cancellations)))
+
+
+def _smallest(scores, k, ties=None):
+    # positions of the k smallest scores, ordered by score and then by ``ties`` (default: position)
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    if k < len(scores):
+        # argpartition keeps an arbitrary subset of the rows tied at the k-th score:
+        # take every row below it, then the first rows equal to it
+        kth = np.partition(scores, k - 1)[k - 1]
+        below = np.flatnonzero(scores < kth)
+        tied = np.flatnonzero(scores == kth)
+        if ties is not None:
+            tied = tied[np.argsort(ties[tied], kind="stable")]
+        positions = np.concatenate([below, tied[:k - len(below)]])
+    else:
+        positions = np.arange(len(scores))
+    secondary = positions if ties is None else ties[positions]
+    return positions[np.lexsort((secondary, scores[positions]))]
+
+
+class LoyaltyRanking:
+    """Loyalty scores of a booking frame, queried for many ``k`` and thresholds.
+
+    The score array is computed once; each query is a linear partial selection.
+
+    Parameters:
+    - df: booking DataFrame (only SCORE_COLUMNS are read)
+    """
+
+    def __init__(self, df):
+        self.index = df.index
+        self.scores = loyalty_score(df)
+
+    def count(self, threshold=DEFAULT_THRESHOLD):
+        """Number of bookings with a score above ``threshold``."""
+        return int(np.count_nonzero(self.scores > threshold))
+
+    def top(self, k=5, threshold=DEFAULT_THRESHOLD):
+        """The ``k`` lowest-scoring bookings with a score above ``threshold``, as the loyalty insight orders them.
+
+        Ties are broken by row position.
+
+        Returns:
+        - Series of scores indexed by the booking index labels, in rank order;
+          ``df.loc[ranking.top(k).index]`` gives the full rows
+        """
+        candidates = np.flatnonzero(self.scores > threshold)
+        ranked = candidates[_smallest(self.scores[candidates], k)]
+        return pd.Series(self.scores[ranked], index=self.index[ranked], name=SCORE_NAME)
+
+
+def loyalty_top(df, k=5, threshold=DEFAULT_THRESHOLD):
+    """Shortcut for ``LoyaltyRanking(df).top(k, threshold)``."""
+    return LoyaltyRanking(df).top(k, threshold)
+
+
+def _partition_top(k, threshold, id_column):
+    # runs on the executors: the partition's k best (score, id) pairs; ties go to the smallest
+    # ids, as in the merge on the driver
+    def top(batches):
+        best = []
+        for batch in batches:
+            scores = loyalty_score(batch)
+            keep = np.flatnonzero(scores > threshold)
+            ids = batch[id_column].to_numpy()
+            picked = keep[_smallest(scores[keep], k, ids[keep])]
+            best = heapq.nsmallest(k, best + list(zip(scores[picked].tolist(), ids[picked].tolist())))
+        yield pd.DataFrame(best, columns=[SCORE_NAME, id_column])
+    return top
+
+
+def spark_loyalty_top(sdf, k=5, threshold=DEFAULT_THRESHOLD, id_column=None):
+    """Loyalty top-k of a Spark DataFrame from a partial top-k of every partition.
+
+    Only the score columns and the id are read; at most ``k`` rows per partition reach
+    the driver. Ties are broken by id, i.e. by row position for the generated id.
+
+    Parameters:
+    - sdf: Spark DataFrame of bookings
+    - k: number of bookings
+    - threshold: only bookings with a score above it are ranked
+    - id_column: integer column identifying the bookings (default: a generated
+      ``monotonically_increasing_id`` column named ``booking_id``)
+
+    Returns:
+    - pandas Series of scores indexed by the booking ids, in rank order
+    """
+    if id_column is None:
+        from pyspark.sql import functions as F
+
+        id_column = "booking_id"
+        sdf = sdf.withColumn(id_column, F.monotonically_increasing_id())
+    narrow = sdf.select(id_column, *SCORE_COLUMNS)
+    rows = narrow.mapInPandas(_partition_top(k, threshold, id_column),
+                              schema=f"{SCORE_NAME} int, {id_column} long").collect()
+    best = heapq.nsmallest(k, ((row[SCORE_NAME], row[id_column]) for row in rows))
+    return pd.Series([score for score, _ in best], index=pd.Index([i for _, i in best], name=id_column),
+                     name=SCORE_NAME)
+
+
+def spark_loyalty_rows(sdf, k=5, threshold=DEFAULT_THRESHOLD):
+    """Full rows of the loyalty top-k of a Spark DataFrame, with the ``loyality`` score, in rank order.
+
+    The ranking is :func:`spark_loyalty_top` over the score columns; only the ``k``
+    winning rows are then read in full, instead of every candidate.
+    """
+    from pyspark.sql import functions as F
+
+    # the generated ids are the same in both scans as long as the partitioning of sdf is
+    with_id = sdf.withColumn("booking_id", F.monotonically_increasing_id())
+    top = spark_loyalty_top(with_id, k, threshold, id_column="booking_id")
+    rows = with_id.where(F.col("booking_id").isin(top.index.tolist()))
+    rows = rows.withColumn(SCORE_NAME, F.col(SCORE_COLUMNS[0]) - F.col(SCORE_COLUMNS[1]))
+    return rows.orderBy(SCORE_NAME, "booking_id").drop("booking_id")
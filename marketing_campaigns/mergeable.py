@@ -0,0 +1,81 @@
+"""Reduction of mergeable states over chunks or Spark partitions.
+
+A mergeable state (``CoMoments``, ``ColumnSketches``, ...) has a ``merge(other)``
+method that combines it with the state of other rows. :func:`reduce_chunks`
+builds the states of pandas chunks on a thread pool and merges them;
+:func:`reduce_partitions` builds one state per Spark partition on the
+executors and merges them on the driver.
+"""
+import os
+import pickle
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+
+def merge_states(state, other):
+    """``state.merge(other)``, with None standing for the state of no rows."""
+    if state is None:
+        return other
+    if other is None:
+        return state
+    return state.merge(other)
+
+
+def row_chunks(df, chunk_rows):
+    """Row slices (views, no copies) of ``df`` with ``chunk_rows`` rows each, produced lazily."""
+    return (df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows))
+
+
+def reduce_chunks(build, chunks, max_workers=None):
+    """Merge ``build(chunk)`` over the chunks, with at most ``max_workers`` chunks in flight.
+
+    A chunk is only read from ``chunks`` when a thread is free for it, so peak memory is
+    about ``max_workers`` chunks however many there are.
+
+    Parameters:
+    - build: callable chunk -> state; NumPy/pandas work releases the GIL, so threads run it in parallel
+    - chunks: iterable of chunks, consumed lazily
+    - max_workers: number of threads (default: number of CPUs)
+
+    Returns:
+    - merged state, None if there were no chunks
+    """
+    workers = max_workers or os.cpu_count() or 1
+    state, pending = None, deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunks:
+            pending.append(pool.submit(build, chunk))
+            if len(pending) >= workers:
+                state = merge_states(state, pending.popleft().result())
+        while pending:
+            state = merge_states(state, pending.popleft().result())
+    return state
+
+
+def _partition_states(build):
+    # runs on the executors: one pickled state per partition
+    def states(batches):
+        state = None
+        for batch in batches:
+            state = merge_states(state, build(batch))
+        if state is not None:
+            yield pd.DataFrame({"state": [pickle.dumps(state)]})
+    return states
+
+
+def reduce_partitions(sdf, build):
+    """Merge ``build(batch)`` over the Arrow batches of every partition of a Spark DataFrame.
+
+    Parameters:
+    - sdf: Spark DataFrame, ideally selected down to the columns ``build`` reads
+    - build: callable pandas DataFrame -> state, shipped to the executors
+
+    Returns:
+    - merged state, None for an empty DataFrame
+    """
+    state = None
+    for row in sdf.mapInPandas(_partition_states(build), schema="state binary").collect():
+        state = merge_states(state, pickle.loads(row["state"]))
+    return state
@@ -0,0 +1,111 @@
+"""Concurrent training of the five cancellation classifiers.
+
+The notebook fits ``LogisticRegression``, ``DecisionTreeClassifier``,
+``RandomForestClassifier``, ``LinearSVC`` and ``GBTClassifier`` one after the
+other, each over the uncached ``train`` split. :func:`train_model_zoo` caches
+``train``/``test`` once and submits all fits from a thread pool in the same
+SparkSession, each thread in its own FAIR scheduler pool, then evaluates every
+model with :func:`marketing_campaigns.evaluation.evaluate_predictions`.
+
+FAIR pools only take effect when the session was created with
+``spark.scheduler.mode=FAIR``; otherwise the jobs still run concurrently, in
+FIFO order.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from pyspark import StorageLevel
+from pyspark.ml.classification import (
+    DecisionTreeClassifier,
+    GBTClassifier,
+    LinearSVC,
+    LogisticRegression,
+    RandomForestClassifier,
+)
+
+from marketing_campaigns.evaluation import evaluate_predictions
+from marketing_campaigns.featurize import FEATURES_COLUMN, LABEL_COLUMN
+from marketing_campaigns.instrument import propagate_job_group
+
+SCHEDULER_POOL_PROPERTY = "spark.scheduler.pool"
+
+
+def default_models(features_col=FEATURES_COLUMN, label_col=LABEL_COLUMN):
+    """The five classifiers of the notebook with their notebook settings."""
+    return {
+        "logistic_regression": LogisticRegression(featuresCol=features_col, labelCol=label_col, maxIter=25),
+        "decision_tree": DecisionTreeClassifier(featuresCol=features_col, labelCol=label_col, maxBins=180),
+        "random_forest": RandomForestClassifier(featuresCol=features_col, labelCol=label_col, maxBins=180),
+        "svm": LinearSVC(featuresCol=features_col, labelCol=label_col, maxIter=10),
+        "gbt": GBTClassifier(featuresCol=features_col, labelCol=label_col, maxIter=10, maxBins=180),
+    }
+
+
+class ModelZoo:
+    """Fitted models of :func:`train_model_zoo` and their comparison.
+
+    Attributes:
+    - models: name -> fitted model
+    - metrics: name -> dict returned by evaluate_predictions
+    - comparison: pandas DataFrame with fit time, inference time and metrics per model
+    """
+
+    def __init__(self, models, metrics, comparison):
+        self.models = models
+        self.metrics = metrics
+        self.comparison = comparison
+
+
+def _fit_and_evaluate(spark, name, estimator, train, test, label_col):
+    spark.sparkContext.setLocalProperty(SCHEDULER_POOL_PROPERTY, name)
+    try:
+        start = time.perf_counter()
+        model = estimator.fit(train)
+        fitted = time.perf_counter()
+        # transform is lazy, so the inference time covers scoring the test split inside the evaluation job
+        metrics = evaluate_predictions(model.transform(test), label_col=label_col)
+        return name, model, metrics, fitted - start, time.perf_counter() - fitted
+    finally:
+        spark.sparkContext.setLocalProperty(SCHEDULER_POOL_PROPERTY, None)
+
+
+def train_model_zoo(train, test, models=None, max_workers=None, label_col=LABEL_COLUMN,
+                    storage_level=StorageLevel.MEMORY_AND_DISK):
+    """Fit and evaluate several classifiers concurrently over cached train/test splits.
+
+    Parameters:
+    - train: training split
+    - test: test split
+    - models: name -> estimator (default: default_models())
+    - max_workers: number of concurrent fits (default: one per model)
+    - label_col: 0/1 label column
+    - storage_level: storage level of the cached splits
+
+    Returns:
+    - ModelZoo
+    """
+    if models is None:
+        models = default_models(label_col=label_col)
+    spark = train.sparkSession
+    train = train.persist(storage_level)
+    test = test.persist(storage_level)
+    # materialize the caches up front so the concurrent fits don't all compute the splits
+    train.count()
+    test.count()
+
+    # the fits run their jobs in the caller's job group, so a traced stage sees them
+    fit_and_evaluate = propagate_job_group(_fit_and_evaluate, spark.sparkContext)
+    with ThreadPoolExecutor(max_workers=max_workers or len(models)) as pool:
+        tasks = [pool.submit(fit_and_evaluate, spark, name, estimator, train, test, label_col)
+                 for name, estimator in models.items()]
+        results = [task.result() for task in tasks]
+
+    fitted, metrics, rows = {}, {}, []
+    for name, model, model_metrics, fit_seconds, inference_seconds in results:
+        fitted[name] = model
+        metrics[name] = model_metrics
+        rows.append({"model": name, "fit_seconds": fit_seconds, "inference_seconds": inference_seconds,
+                     **model_metrics})
+    comparison = pd.DataFrame(rows).set_index("model").sort_values("auc", ascending=False)
+    return ModelZoo(fitted, metrics, comparison)
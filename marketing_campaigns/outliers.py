@@ -0,0 +1,156 @@
+"""Interquartile-range outlier removal used in Data Preprocessing Part-1.
+
+Two semantics are supported:
+
+- ``"sequential"`` reproduces the notebook: columns are filtered one after the
+  other and each column's bounds are computed on the rows that survived the
+  previous columns, so the result depends on the column order.
+- ``"joint"`` computes the bounds of all columns on the same rows in a single
+  ``quantile`` call and drops every row outside any of them.
+
+Either way only one boolean mask is built and the frame is materialized once.
+:func:`remove_outlier_spark` applies the joint semantics to a Spark DataFrame
+using ``approxQuantile``, and :func:`iqr_bounds_chunks` computes joint bounds
+over data that doesn't fit in memory from mergeable quantile sketches.
+"""
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+OUTLIER_MODES = ("sequential", "joint")
+
+
+def _bounds_frame(q1, q3, k):
+    iqr = q3 - q1
+    return pd.DataFrame({"q1": q1, "q3": q3, "lower": q1 - k * iqr, "upper": q3 + k * iqr})
+
+
+def iqr_bounds(df, columns, k=1.5, interpolation="linear"):
+    """IQR bounds of several columns computed with one ``quantile`` call.
+
+    Parameters:
+    - df: DataFrame containing the data
+    - columns: column names
+    - k: IQR multiplier
+    - interpolation: quantile interpolation, 'linear' (pandas default) or 'midpoint'
+      (same as ``np.percentile(..., method='midpoint')``)
+
+    Returns:
+    - DataFrame indexed by column with q1, q3, lower and upper
+    """
+    quantiles = df[list(columns)].quantile([0.25, 0.75], interpolation=interpolation)
+    return _bounds_frame(quantiles.loc[0.25], quantiles.loc[0.75], k)
+
+
+def outlier_mask(df, bounds):
+    """Boolean array that is True for the rows inside the bounds of every column.
+
+    Parameters:
+    - df: DataFrame containing the data
+    - bounds: DataFrame as returned by :func:`iqr_bounds` (or ``DataProfile.iqr_bounds``)
+
+    Returns:
+    - numpy boolean array of length ``len(df)``
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for col, lower, upper in zip(bounds.index, bounds["lower"], bounds["upper"]):
+        values = df[col].to_numpy()
+        mask &= (values >= lower) & (values <= upper)
+    return mask
+
+
+def iqr_bounds_chunks(chunks, columns, k=1.5, interpolation="linear", sketch_k=None, max_workers=None):
+    """IQR bounds over chunks of rows, from KLL sketches built in parallel and merged.
+
+    The bounds have the joint semantics (every column's quartiles over all rows); apply
+    them chunk by chunk with :func:`outlier_mask`.
+
+    Parameters:
+    - chunks: iterable of DataFrames, e.g. loader.iter_booking_chunks(path)
+    - columns: column names
+    - k: IQR multiplier
+    - interpolation: quantile interpolation, 'linear' or 'midpoint'
+    - sketch_k: KLL parameter (default: sketches.DEFAULT_K); see sketches.k_for_error()
+    - max_workers: number of threads sketching chunks
+
+    Returns:
+    - DataFrame indexed by column with q1, q3, lower and upper
+    """
+    from marketing_campaigns.sketches import DEFAULT_K, sketch_chunks
+
+    sketches = sketch_chunks(chunks, list(columns), k=sketch_k or DEFAULT_K, max_workers=max_workers)
+    return sketches.iqr_bounds(k=k, interpolation=interpolation)
+
+
+def remove_outlier(df, columns, interpolation="linear", mode="sequential", k=1.5, bounds=None):
+    """Remove outliers from the specified columns using the Interquartile Range (IQR) method.
+
+    Parameters:
+    - df: DataFrame containing the data
+    - columns: column names for which outliers should be removed
+    - interpolation: quantile interpolation, 'linear' or 'midpoint'
+    - mode: 'sequential' (bounds recomputed on the surviving rows, column by column,
+      as in the notebook) or 'joint' (all bounds computed on the input rows)
+    - k: IQR multiplier
+    - bounds: precomputed bounds for the 'joint' mode, e.g. from a DataProfile
+
+    Returns:
+    - DataFrame with outliers removed
+    """
+    if mode not in OUTLIER_MODES:
+        raise ValueError(f"mode must be one of {OUTLIER_MODES}, got {mode!r}")
+    if mode == "joint":
+        if bounds is None:
+            bounds = iqr_bounds(df, columns, k=k, interpolation=interpolation)
+        return df[outlier_mask(df, bounds.loc[list(columns)])]
+
+    mask = np.ones(len(df), dtype=bool)
+    for col in columns:
+        values = df[col].to_numpy()
+        # only the surviving values of this one column are copied, never the frame
+        q1, q3 = pd.Series(values[mask]).quantile([0.25, 0.75], interpolation=interpolation)
+        iqr = q3 - q1
+        mask &= (values >= q1 - k * iqr) & (values <= q3 + k * iqr)
+    return df[mask]
+
+
+def iqr_bounds_spark(sdf, columns, k=1.5, relative_error=0.001):
+    """IQR bounds of several columns of a Spark DataFrame from one ``approxQuantile`` job.
+
+    Parameters:
+    - sdf: Spark DataFrame
+    - columns: column names
+    - k: IQR multiplier
+    - relative_error: target relative error of the quantiles (0 computes them exactly, at a high cost)
+
+    Returns:
+    - pandas DataFrame indexed by column with q1, q3, lower and upper
+    """
+    columns = list(columns)
+    quantiles = sdf.approxQuantile(columns, [0.25, 0.75], relative_error)
+    q1 = pd.Series([q[0] for q in quantiles], index=columns)
+    q3 = pd.Series([q[1] for q in quantiles], index=columns)
+    return _bounds_frame(q1, q3, k)
+
+
+def remove_outlier_spark(sdf, columns, k=1.5, relative_error=0.001, bounds=None):
+    """Spark counterpart of ``remove_outlier(..., mode='joint')``.
+
+    Parameters:
+    - sdf: Spark DataFrame
+    - columns: column names for which outliers should be removed
+    - k: IQR multiplier
+    - relative_error: target relative error of ``approxQuantile``
+    - bounds: precomputed bounds, skips the quantile job
+
+    Returns:
+    - filtered Spark DataFrame (lazy, a single filter over all columns)
+    """
+    from pyspark.sql import functions as F
+
+    if bounds is None:
+        bounds = iqr_bounds_spark(sdf, columns, k=k, relative_error=relative_error)
+    conditions = [F.col(col).between(float(bounds.at[col, "lower"]), float(bounds.at[col, "upper"]))
+                  for col in columns]
+    return sdf.filter(reduce(lambda a, b: a & b, conditions))
@@ -0,0 +1,27 @@
+"""Data Preprocessing Part-1 and Feature Engineering as one reusable step."""
+from marketing_campaigns.loader import clean_bookings
+from marketing_campaigns.outliers import remove_outlier
+from marketing_campaigns.schema import OUTLIER_COLUMNS
+
+
+def add_revenue(df):
+    """Add the ``revenue`` column: adr times the total number of nights."""
+    return df.assign(revenue=df["adr"] * (df["stays_in_weekend_nights"] + df["stays_in_week_nights"]))
+
+
+def preprocess_bookings(df, outlier_columns=OUTLIER_COLUMNS, interpolation="linear", outlier_mode="sequential"):
+    """Drop unused columns and incomplete rows, remove outliers and add revenue.
+
+    Parameters:
+    - df: raw or already cleaned booking DataFrame
+    - outlier_columns: columns passed to the IQR filter; empty to skip it
+    - interpolation: quantile interpolation of the IQR filter
+    - outlier_mode: 'sequential' or 'joint' semantics of the IQR filter
+
+    Returns:
+    - preprocessed DataFrame
+    """
+    df = clean_bookings(df)
+    if outlier_columns:
+        df = remove_outlier(df, outlier_columns, interpolation=interpolation, mode=outlier_mode)
+    return add_revenue(df)
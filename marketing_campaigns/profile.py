@@ -0,0 +1,178 @@
+"""Single-pass data profile behind the "Basic Understanding of Data" table.
+
+The notebook builds ``overview`` and ``outliers`` with ``df.apply`` lambdas that
+call ``quantile`` six times per column, numeric or not. :class:`DataProfile`
+computes every quantile of every numeric column in one ``quantile`` call and
+the other statistics with one vectorized reduction each, and keeps the results
+so the skewness chart and the outlier filter can reuse them.
+"""
+import weakref
+from functools import cached_property
+
+import pandas as pd
+
+_PROFILES = {}
+
+
+class DataProfile:
+    """Statistics of a booking DataFrame, computed lazily per dtype group and cached.
+
+    Parameters:
+    - df: DataFrame to profile; only a weak reference is kept, so sections not
+      computed before the frame is garbage collected become unavailable
+    - k: IQR multiplier used for the outlier bounds
+    """
+
+    def __init__(self, df, k=1.5):
+        self._df = weakref.ref(df)
+        self.k = k
+        self.shape = df.shape
+
+    @property
+    def df(self):
+        df = self._df()
+        if df is None:
+            raise ReferenceError("the profiled DataFrame no longer exists")
+        return df
+
+    @cached_property
+    def numeric_columns(self):
+        return list(self.df.select_dtypes(include="number").columns)
+
+    @cached_property
+    def other_columns(self):
+        return [c for c in self.df.columns if c not in set(self.numeric_columns)]
+
+    @cached_property
+    def missing(self):
+        """Percentage of missing values per column."""
+        return round(self.df.isna().sum() / self.shape[0], 3) * 100
+
+    @cached_property
+    def numeric(self):
+        """min/max/mean/median/q1/q3/skew, IQR bounds and outlier count of every numeric column."""
+        numeric = self.df[self.numeric_columns]
+        quantiles = numeric.quantile([0.25, 0.5, 0.75])
+        stats = numeric.agg(["min", "max", "mean", "skew"]).T
+        stats["q1"] = quantiles.loc[0.25]
+        stats["median"] = quantiles.loc[0.5]
+        stats["q3"] = quantiles.loc[0.75]
+        iqr = stats["q3"] - stats["q1"]
+        stats["lower"] = stats["q1"] - self.k * iqr
+        stats["upper"] = stats["q3"] + self.k * iqr
+        # one broadcast comparison against all bounds instead of a lambda per column
+        stats["outliers"] = ((numeric < stats["lower"]) | (numeric > stats["upper"])).sum()
+        return stats
+
+    @cached_property
+    def uniques(self):
+        """Distinct values of every non-numeric column."""
+        uniques = {}
+        for col in self.other_columns:
+            values = self.df[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # categories are already known, only the missing marker needs a scan
+                uniques[col] = list(values.cat.categories) + ([float("nan")] if values.isna().any() else [])
+            else:
+                uniques[col] = list(values.unique())
+        return uniques
+
+    def skewness(self, columns=None):
+        """Skewness of ``columns`` (default: all numeric columns), sorted ascending."""
+        skew = self.numeric["skew"]
+        return (skew if columns is None else skew[list(columns)]).sort_values()
+
+    def iqr_bounds(self, columns=None):
+        """DataFrame with the ``lower``/``upper`` IQR bounds of ``columns``."""
+        bounds = self.numeric[["q1", "q3", "lower", "upper"]]
+        return bounds if columns is None else bounds.loc[list(columns)]
+
+    def summary(self):
+        """Types, Missing%, Overview and Outliers per column, like the notebook's ``explo`` table."""
+        stats = self.numeric
+        overview = {
+            col: [round(stats.at[col, s]) for s in ("min", "max", "mean", "median")]
+            for col in self.numeric_columns
+        }
+        overview.update(self.uniques)
+        # object column, so the counts stay integers next to the blanks of the non-numeric columns
+        outliers = stats["outliers"].astype(int).astype(object).reindex(self.df.columns).fillna("")
+        # dtype objects of different kinds don't compare, so sort on their names
+        return pd.DataFrame({"Types": self.df.dtypes.astype(str),
+                             "Missing%": self.missing,
+                             "Overview": pd.Series(overview),
+                             "Outliers": outliers}).sort_values(by=["Missing%", "Types"], ascending=False)
+
+
+def _fingerprint(df):
+    # one vectorized hash pass: far cheaper than the profile, and it sees in-place value edits
+    try:
+        content = int(pd.util.hash_pandas_object(df, index=True).sum())
+    except TypeError:
+        content = None
+    return df.shape, tuple(map(str, df.columns)), tuple(map(str, df.dtypes)), content
+
+
+def profile_frame(df, k=1.5):
+    """Return the cached :class:`DataProfile` of ``df``, building it on first use.
+
+    The cache holds the frame by weak reference (DataFrames are unhashable, so the entry
+    is found by ``id`` and checked against the reference, which a reused id never matches)
+    and is invalidated when the frame's shape, columns, dtypes or values change, e.g. after
+    ``fillna(inplace=True)`` or ``df.loc[...] = ...``. A frame with unhashable cells is only
+    checked by shape, columns and dtypes. A profile is dropped together with its frame.
+
+    Parameters:
+    - df: DataFrame to profile
+    - k: IQR multiplier used for the outlier bounds
+
+    Returns:
+    - DataProfile
+    """
+    key = id(df)
+    fingerprint = _fingerprint(df)
+    cached = _PROFILES.get(key)
+    if cached is not None:
+        ref, cached_fingerprint, profile = cached
+        if ref() is df and cached_fingerprint == fingerprint and profile.k == k:
+            return profile
+    profile = DataProfile(df, k=k)
+
+    def forget(ref):
+        # only the entry of this frame: the id may already belong to a new frame
+        entry = _PROFILES.get(key)
+        if entry is not None and entry[0] is ref:
+            del _PROFILES[key]
+
+    _PROFILES[key] = (weakref.ref(df, forget), fingerprint, profile)
+    return profile
+
+
+def numeric_profile(chunks, columns=None, k=1.5, sketch_k=None, max_workers=None):
+    """DataProfile.numeric for data read in chunks, from mergeable sketches.
+
+    Quantiles (and so the bounds) are approximate within the sketch rank error; min,
+    max, mean and skew are exact. The outlier counts take a second pass over the chunks.
+
+    Parameters:
+    - chunks: callable returning an iterable of DataFrames, e.g.
+      ``lambda: iter_booking_chunks(path)``
+    - columns: numeric columns (default: those of the first chunk)
+    - k: IQR multiplier used for the outlier bounds
+    - sketch_k: KLL parameter (default: sketches.DEFAULT_K)
+    - max_workers: number of threads sketching chunks
+
+    Returns:
+    - DataFrame indexed by column
+    """
+    from marketing_campaigns.sketches import DEFAULT_K, sketch_chunks
+
+    if columns is None:
+        columns = list(next(iter(chunks())).select_dtypes(include="number").columns)
+    stats = sketch_chunks(chunks(), columns, k=sketch_k or DEFAULT_K, max_workers=max_workers).numeric_summary(k)
+    outliers = pd.Series(0, index=columns)
+    for chunk in chunks():
+        numeric = chunk[columns]
+        outliers += ((numeric < stats["lower"]) | (numeric > stats["upper"])).sum()
+    stats["outliers"] = outliers
+    return stats
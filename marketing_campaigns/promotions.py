@@ -0,0 +1,174 @@
+"""Promotion segments as packed bitmaps.
+
+The notebook derives its four promotions -- loyal customers, the top agents,
+the least-booked room types and the summer months -- with a separate filter
+each, and every combination of them would be another scan. A rule here is
+declared once as a list of conditions, compiled into a vectorized predicate,
+and all rules are evaluated together in one pass over the bookings. Each
+rule's membership is kept as a ``np.packbits`` bitmap (one bit per booking),
+so intersections, unions and audience sizes are byte-wise operations on
+arrays 8x smaller than a boolean mask.
+"""
+import operator
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 1 << 20
+
+# rule name -> conditions (column, operator, value), all of which must hold
+PROMOTION_RULES = {
+    # promotion #1: many kept previous bookings and no cancellation
+    "loyal_customers": [("previous_bookings_not_canceled", ">", 3), ("previous_cancellations", "==", 0)],
+    # promotion #2: the agencies bringing the most bookings
+    "top_agents": [("agent", "in", (9, 240, 7))],
+    # promotion #3: the least booked room types
+    "least_booked_rooms": [("reserved_room_type", "in", ("L", "H", "C", "B", "G"))],
+    # promotion #4: the months with the highest prices
+    "summer_months": [("arrival_date_month", "in", ("August", "July", "June"))],
+}
+
+COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+OPERATORS = tuple(COMPARISONS) + ("in", "not in")
+
+# number of set bits of every byte value
+_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+def _isin(values, members):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # one lookup per category; code -1 (missing) reads the trailing False
+        table = np.append(values.cat.categories.isin(members), False)
+        return table[values.cat.codes.to_numpy()]
+    return values.isin(members).to_numpy()
+
+
+def compile_condition(column, op, value):
+    """Vectorized predicate DataFrame -> boolean array for one condition; missing values never match."""
+    if op not in OPERATORS:
+        raise ValueError(f"unknown operator {op!r}, expected one of {OPERATORS}")
+    if op == "in":
+        members = list(value)
+        return lambda df: _isin(df[column], members)
+    if op == "not in":
+        members = list(value)
+        return lambda df: ~_isin(df[column], members) & df[column].notna().to_numpy()
+    compare = COMPARISONS[op]
+    return lambda df: np.asarray(compare(df[column].to_numpy(), value), dtype=bool)
+
+
+def compile_rule(conditions):
+    """Vectorized predicate of a rule: the AND of its conditions."""
+    predicates = [compile_condition(*condition) for condition in conditions]
+
+    def predicate(df):
+        mask = np.ones(len(df), dtype=bool)
+        for condition in predicates:
+            mask &= condition(df)
+        return mask
+    return predicate
+
+
+def count_bits(bits):
+    """Number of set bits of a packed bitmap."""
+    return int(_POPCOUNT[bits].sum(dtype=np.int64))
+
+
+class SegmentBitmaps:
+    """Packed membership bitmaps of the promotion rules over a booking frame.
+
+    Parameters:
+    - bitmaps: rule name -> packed uint8 array (``np.packbits`` of the membership mask)
+    - index: index of the bookings, in bitmap order
+    """
+
+    def __init__(self, bitmaps, index):
+        self.bitmaps = bitmaps
+        self.index = index
+
+    @property
+    def rules(self):
+        return list(self.bitmaps)
+
+    def segment(self, all_of=(), any_of=(), none_of=()):
+        """Packed bitmap of the bookings in every rule of ``all_of``, at least one of ``any_of``
+        (if given) and none of ``none_of``."""
+        n_bytes = (len(self.index) + 7) // 8
+        bits = np.full(n_bytes, 0xFF, dtype=np.uint8)
+        for name in all_of:
+            bits &= self.bitmaps[name]
+        if any_of:
+            union = np.zeros(n_bytes, dtype=np.uint8)
+            for name in any_of:
+                union |= self.bitmaps[name]
+            bits &= union
+        for name in none_of:
+            bits &= ~self.bitmaps[name]
+        # the padding bits of the last byte stay clear
+        tail = len(self.index) % 8
+        if tail:
+            bits[-1] &= (0xFF << (8 - tail)) & 0xFF
+        return bits
+
+    def size(self, *names, **segment):
+        """Audience size of a rule, or of ``segment(...)`` when called with keywords."""
+        if names:
+            return count_bits(self.segment(all_of=names))
+        return count_bits(self.segment(**segment))
+
+    def sizes(self):
+        """Series of the audience size of every rule."""
+        return pd.Series({name: count_bits(bits) for name, bits in self.bitmaps.items()}, name="bookings")
+
+    def overlaps(self):
+        """DataFrame of the number of bookings in both rules of every pair (the diagonal holds the sizes)."""
+        names = self.rules
+        table = pd.DataFrame(0, index=names, columns=names)
+        for i, a in enumerate(names):
+            for b in names[i:]:
+                table.loc[a, b] = table.loc[b, a] = count_bits(self.bitmaps[a] & self.bitmaps[b])
+        return table
+
+    def mask(self, bits):
+        """Boolean mask of a packed bitmap, e.g. of ``segment(...)``."""
+        return np.unpackbits(bits, count=len(self.index)).astype(bool)
+
+    def audience(self, bits):
+        """Booking index labels of a packed bitmap; ``df.loc[...]`` gives the rows."""
+        return self.index[self.mask(bits)]
+
+
+def evaluate_rules(df, rules=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Evaluate every rule in one pass over the bookings.
+
+    Rows are processed in slices of ``chunk_rows`` (a multiple of 8, so the packed
+    slices concatenate) and every rule is applied to a slice while it is in cache.
+
+    Parameters:
+    - df: booking DataFrame
+    - rules: rule name -> conditions (default: PROMOTION_RULES)
+    - chunk_rows: rows per slice
+
+    Returns:
+    - SegmentBitmaps
+    """
+    rules = PROMOTION_RULES if rules is None else rules
+    predicates = {name: compile_rule(conditions) for name, conditions in rules.items()}
+    columns = list(dict.fromkeys(column for conditions in rules.values() for column, _, _ in conditions))
+    chunk_rows = max(8, chunk_rows - chunk_rows % 8)
+    narrow = df[columns]
+    parts = {name: [] for name in predicates}
+    for start in range(0, len(narrow), chunk_rows):
+        chunk = narrow.iloc[start:start + chunk_rows]
+        for name, predicate in predicates.items():
+            parts[name].append(np.packbits(predicate(chunk)))
+    empty = np.zeros(0, dtype=np.uint8)
+    bitmaps = {name: np.concatenate(chunks) if chunks else empty for name, chunks in parts.items()}
+    return SegmentBitmaps(bitmaps, df.index)
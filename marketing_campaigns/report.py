@@ -0,0 +1,222 @@
+"""Headless, parallel rendering of the EDA charts.
+
+The notebook draws the skewness bars, the correlation heatmap, the
+``sns.histplot`` breakdowns and the Plotly box plot one at a time with
+``plt.show()``. :func:`render_report` reduces every chart to the small frame it
+actually plots (value counts instead of filtered copies of the bookings, box
+statistics instead of raw adr values), fans the drawing out over a process
+pool with the non-interactive Agg backend, and writes PNG/HTML files to an
+output directory. A chart whose input hash matches the previous run is skipped.
+"""
+import hashlib
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from marketing_campaigns.correlation import correlation_frame
+from marketing_campaigns.profile import profile_frame
+from marketing_campaigns.schema import OUTLIER_COLUMNS
+
+MANIFEST_FILE = "manifest.json"
+
+# name: chart identifier and output file stem; kind: renderer; data: small DataFrame; options: renderer kwargs
+ChartJob = namedtuple("ChartJob", ["name", "kind", "data", "options"])
+
+
+def _counts(df, column, hue=None):
+    keys = [column] if hue is None else [column, hue]
+    return df.groupby(keys, observed=True).size().rename("count").reset_index()
+
+
+def _box_stats(df, x, y, color):
+    grouped = df.groupby([x, color], observed=True)[y]
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ["q1", "median", "q3"]
+    iqr = stats["q3"] - stats["q1"]
+    stats["lowerfence"] = pd.concat([grouped.min(), stats["q1"] - 1.5 * iqr], axis=1).max(axis=1)
+    stats["upperfence"] = pd.concat([grouped.max(), stats["q3"] + 1.5 * iqr], axis=1).min(axis=1)
+    return stats.reset_index()
+
+
+def eda_chart_jobs(df, columns=OUTLIER_COLUMNS, reference=None, correlation=None):
+    """Chart jobs of the EDA section.
+
+    Parameters:
+    - df: preprocessed booking DataFrame (with ``revenue``)
+    - columns: continuous columns of the skewness chart
+    - reference: optional frame before outlier removal, for the first skewness chart
+    - correlation: precomputed correlation matrix of the heatmap, e.g. from
+      correlation.correlation() over chunks or spark_correlation(); computed from ``df`` when omitted
+
+    Returns:
+    - list of ChartJob
+    """
+    kept = df[df["is_canceled"] == 0]
+    canceled = df[df["is_canceled"] == 1]
+    jobs = []
+    if reference is not None:
+        skew = profile_frame(reference).skewness(columns)
+        jobs.append(ChartJob("skewness_before_outliers", "skewness", skew.rename("skewness").to_frame(), {}))
+    skew = profile_frame(df).skewness(columns)
+    jobs.append(ChartJob("skewness", "skewness", skew.rename("skewness").to_frame(), {}))
+    if correlation is None:
+        correlation = correlation_frame(df)
+    jobs.append(ChartJob("correlation", "heatmap", correlation, {}))
+    for label, frame in (("not_canceled", kept), ("canceled", canceled)):
+        jobs.append(ChartJob(f"lead_time_{label}", "hist", _counts(frame, "lead_time"),
+                             {"x": "lead_time", "bins": 20}))
+        for column in ("arrival_date_month", "deposit_type", "customer_type"):
+            jobs.append(ChartJob(f"{column}_{label}", "hist", _counts(frame, column), {"y": column}))
+        # numpy can't pick 'auto' bins for weighted data, so the integer counts get one bin per value
+        jobs.append(ChartJob(f"total_of_special_requests_{label}", "hist",
+                             _counts(frame, "total_of_special_requests"),
+                             {"y": "total_of_special_requests", "discrete": True}))
+    jobs.append(ChartJob("reserved_room_type_by_hotel", "hist", _counts(kept, "reserved_room_type", "hotel"),
+                         {"x": "reserved_room_type", "hue": "hotel", "multiple": "stack"}))
+    for measure in ("adr", "revenue"):
+        totals = df.groupby("arrival_date_month", observed=True)[measure].sum().to_frame()
+        jobs.append(ChartJob(f"{measure}_by_month", "bar", totals, {"y": measure}))
+    jobs.append(ChartJob("adr_by_room_type", "box", _box_stats(kept, "reserved_room_type", "adr", "hotel"),
+                         {"x": "reserved_room_type", "color": "hotel"}))
+    return jobs
+
+
+def chart_hash(job):
+    """Hash of a chart's kind, options and input data."""
+    digest = hashlib.sha256()
+    digest.update(job.kind.encode())
+    digest.update(json.dumps(job.options, sort_keys=True).encode())
+    digest.update(json.dumps([str(c) for c in job.data.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(job.data, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _init_worker():
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import seaborn as sns
+
+    sns.set(style="darkgrid", font_scale=1.5)
+
+
+def _render_skewness(job, path):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    skewness = job.data["skewness"]
+    plt.figure(figsize=(14, 6))
+    sns.barplot(x=skewness.index, y=skewness, palette=sns.color_palette("Reds", 19))
+    for i, v in enumerate(skewness):
+        plt.text(i, v, f"{v:.1f}", ha="center", va="bottom", size=15, fontweight="black")
+    plt.ylabel("Skewness")
+    plt.xlabel("Columns")
+    plt.xticks(rotation=90)
+    plt.title("Skewness of Continous Numerical Columns", fontweight="black", size=20, pad=10)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def _render_heatmap(job, path):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(20, 8))
+    sns.heatmap(job.data, annot=True, cmap="coolwarm", fmt=".2f")
+    plt.title("Correlation Matrix Heatmap")
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def _render_hist(job, path):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure()
+    # the value counts are drawn as weights, which gives the same bars as the raw rows; numeric
+    # columns need explicit bins (or discrete=True), as 'auto' binning rejects weights
+    sns.histplot(data=job.data, weights="count", **job.options)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def _render_bar(job, path):
+    import matplotlib.pyplot as plt
+
+    plt.figure()
+    job.data[job.options["y"]].plot(kind="bar")
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def _render_box(job, path):
+    import plotly.graph_objects as go
+
+    x, color = job.options["x"], job.options["color"]
+    fig = go.Figure()
+    for name, stats in job.data.groupby(color, observed=True):
+        fig.add_trace(go.Box(name=str(name), x=stats[x], q1=stats["q1"], median=stats["median"], q3=stats["q3"],
+                             lowerfence=stats["lowerfence"], upperfence=stats["upperfence"]))
+    fig.update_layout(boxmode="group", xaxis_title=x, yaxis_title="adr", legend_title=color)
+    fig.write_html(path, include_plotlyjs="cdn")
+
+
+RENDERERS = {
+    "skewness": (_render_skewness, "png"),
+    "heatmap": (_render_heatmap, "png"),
+    "hist": (_render_hist, "png"),
+    "bar": (_render_bar, "png"),
+    "box": (_render_box, "html"),
+}
+
+
+def _render(job, path):
+    RENDERERS[job.kind][0](job, path)
+    return path
+
+
+def render_report(jobs, out_dir, max_workers=None, force=False):
+    """Render chart jobs in parallel into ``out_dir``, skipping the unchanged ones.
+
+    Parameters:
+    - jobs: list of ChartJob, e.g. from eda_chart_jobs()
+    - out_dir: output directory, holding the charts and their input hashes
+    - max_workers: size of the process pool (default: number of CPUs)
+    - force: render every chart even if its input did not change
+
+    Returns:
+    - dict name -> (path, rendered) where rendered is False for skipped charts
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    results, pending = {}, []
+    for job in jobs:
+        path = os.path.join(out_dir, f"{job.name}.{RENDERERS[job.kind][1]}")
+        digest = chart_hash(job)
+        if not force and manifest.get(job.name) == digest and os.path.exists(path):
+            results[job.name] = (path, False)
+        else:
+            pending.append((job, path, digest))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+            futures = [(job, digest, pool.submit(_render, job, path)) for job, path, digest in pending]
+            for job, digest, future in futures:
+                results[job.name] = (future.result(), True)
+                manifest[job.name] = digest
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return results
@@ -0,0 +1,70 @@
+"""Column schema of ``egphotelbookings.csv`` (see the Business Understanding table)."""
+
+# string columns, stored as pandas categoricals instead of Python objects
+CATEGORICAL_COLUMNS = [
+    "hotel",
+    "arrival_date_month",
+    "meal",
+    "country",
+    "distribution_channel",
+    "reserved_room_type",
+    "assigned_room_type",
+    "deposit_type",
+    "customer_type",
+]
+
+# explicit dtypes for every column of the raw export; the widths are chosen
+# from the observed ranges (e.g. lead_time <= 737, adults <= 55) with headroom
+BOOKING_DTYPES = {
+    "Unnamed: 0": "int64",
+    "hotel": "category",
+    "is_canceled": "int8",
+    "lead_time": "int16",
+    "arrival_date_year": "int16",
+    "arrival_date_month": "category",
+    "arrival_date_week_number": "int8",
+    "arrival_date_day_of_month": "int8",
+    "stays_in_weekend_nights": "int16",
+    "stays_in_week_nights": "int16",
+    "adults": "int16",
+    # children / agent / company contain NaN, so they stay floating point
+    "children": "float32",
+    "babies": "int8",
+    "meal": "category",
+    "country": "category",
+    "distribution_channel": "category",
+    "is_repeated_guest": "int8",
+    "previous_cancellations": "int16",
+    "previous_bookings_not_canceled": "int16",
+    "reserved_room_type": "category",
+    "assigned_room_type": "category",
+    "booking_changes": "int16",
+    "deposit_type": "category",
+    "agent": "float32",
+    "company": "float32",
+    "days_in_waiting_list": "int16",
+    "customer_type": "category",
+    "adr": "float32",
+    "required_car_parking_spaces": "int8",
+    "total_of_special_requests": "int8",
+}
+
+# Data Preprocessing Part-1
+DROP_COLUMNS = ["company", "babies", "Unnamed: 0", "arrival_date_week_number"]
+DROPNA_SUBSET = ["country", "children"]
+
+# continuous numerical columns used for the skewness chart and outlier removal
+OUTLIER_COLUMNS = [
+    "adr",
+    "lead_time",
+    "stays_in_weekend_nights",
+    "stays_in_week_nights",
+    "adults",
+    "is_repeated_guest",
+    "previous_cancellations",
+    "previous_bookings_not_canceled",
+    "booking_changes",
+    "days_in_waiting_list",
+    "required_car_parking_spaces",
+    "total_of_special_requests",
+]
@@ -0,0 +1,283 @@
+"""JVM-free cancellation scoring of single bookings.
+
+Scoring one new booking with ``featurizationPipelineModel`` and
+``lrModel``/``gbtModel.transform`` needs a SparkSession. :func:`export_scorer`
+writes what those fitted models actually use -- the StringIndexer vocabularies,
+the VectorAssembler column order, the linear coefficients or the tree arrays --
+to one compressed ``.npz`` file, and :class:`BookingScorer` scores booking dicts
+(or batches of columns) from that file with NumPy only.
+
+This module imports nothing but NumPy so that loading a scorer stays fast.
+"""
+import json
+import math
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+LINEAR_MODELS = {"LogisticRegressionModel": "logistic", "LinearSVCModel": "margin"}
+TREE_MODELS = {
+    "DecisionTreeClassificationModel": "tree_probability",
+    "RandomForestClassificationModel": "tree_probability",
+    "GBTClassificationModel": "gbt",
+}
+
+
+def _labels(indexer):
+    return list(indexer.labelsArray[0]) if hasattr(indexer, "labelsArray") else list(indexer.labels)
+
+
+def _flatten_tree(java_root, leaf_value):
+    """Walk a fitted Spark tree (through its JVM nodes) into flat node arrays."""
+    feature, threshold, left, right, value, categories = [], [], [], [], [], []
+    stack = [(java_root, None, None)]
+    while stack:
+        node, parent, is_left = stack.pop()
+        index = len(feature)
+        if parent is not None:
+            (left if is_left else right)[parent] = index
+        feature.append(-1)
+        threshold.append(0.0)
+        left.append(-1)
+        right.append(-1)
+        categories.append(None)
+        value.append(leaf_value(node))
+        if node.getClass().getSimpleName() == "InternalNode":
+            split = node.split()
+            feature[index] = split.featureIndex()
+            if split.getClass().getSimpleName() == "CategoricalSplit":
+                categories[index] = sorted(int(c) for c in split.leftCategories())
+            else:
+                threshold[index] = split.threshold()
+            stack.append((node.rightChild(), index, False))
+            stack.append((node.leftChild(), index, True))
+    return feature, threshold, left, right, value, categories
+
+
+def _tree_arrays(model, kind):
+    if kind == "gbt":
+        trees, weights = model.trees, list(model.treeWeights)
+
+        def leaf_value(node):
+            return node.prediction()
+    else:
+        trees = model.trees if hasattr(model, "trees") else [model]
+        weights = [1.0 / len(trees)] * len(trees)
+
+        def leaf_value(node):
+            # class counts of the training rows that reached the node -> probability of class 1
+            stats = list(node.impurityStats().stats())
+            total = sum(stats)
+            return stats[1] / total if total and len(stats) > 1 else 0.0
+
+    columns = {"feature": [], "threshold": [], "left": [], "right": [], "value": []}
+    roots, split_categories, category_index = [], [], []
+    for tree in trees:
+        offset = len(columns["feature"])
+        roots.append(offset)
+        feature, threshold, left, right, value, categories = _flatten_tree(tree._java_obj.rootNode(), leaf_value)
+        columns["feature"] += feature
+        columns["threshold"] += threshold
+        columns["left"] += [c + offset if c >= 0 else -1 for c in left]
+        columns["right"] += [c + offset if c >= 0 else -1 for c in right]
+        columns["value"] += value
+        for cats in categories:
+            if cats is None:
+                category_index.append(-1)
+            else:
+                category_index.append(len(split_categories))
+                split_categories.append(cats)
+
+    width = max((max(c) + 1 for c in split_categories if c), default=1)
+    category_left = np.zeros((len(split_categories), width), dtype=bool)
+    for row, cats in enumerate(split_categories):
+        category_left[row, cats] = True
+    return {
+        "tree_roots": np.array(roots, dtype=np.int32),
+        "tree_weights": np.array(weights, dtype=np.float64),
+        "node_feature": np.array(columns["feature"], dtype=np.int32),
+        "node_threshold": np.array(columns["threshold"], dtype=np.float64),
+        "node_left": np.array(columns["left"], dtype=np.int32),
+        "node_right": np.array(columns["right"], dtype=np.int32),
+        "node_value": np.array(columns["value"], dtype=np.float64),
+        "node_category": np.array(category_index, dtype=np.int32),
+        "category_left": category_left,
+    }
+
+
+def export_scorer(featurization_model, model, path):
+    """Write a fitted featurization PipelineModel and classifier to a compact scoring file.
+
+    Parameters:
+    - featurization_model: PipelineModel with StringIndexerModel stages and a VectorAssembler
+    - model: fitted LogisticRegression, LinearSVC, DecisionTree, RandomForest or GBT classifier
+    - path: target ``.npz`` file
+
+    Returns:
+    - path
+    """
+    vocabularies, inputs = {}, None
+    for stage in featurization_model.stages:
+        name = type(stage).__name__
+        if name == "StringIndexerModel":
+            vocabularies[stage.getOutputCol()] = (stage.getInputCol(), _labels(stage))
+        elif name == "VectorAssembler":
+            inputs = list(stage.getInputCols())
+    if inputs is None:
+        raise ValueError("the featurization model has no VectorAssembler stage")
+
+    # every assembled feature is either a raw numeric column or the index of a categorical one
+    features = []
+    arrays = {}
+    for position, column in enumerate(inputs):
+        if column in vocabularies:
+            source, labels = vocabularies[column]
+            features.append({"column": source, "categorical": True})
+            arrays[f"vocabulary_{position}"] = np.array(labels, dtype=str)
+        else:
+            features.append({"column": column, "categorical": False})
+
+    kind_name = type(model).__name__
+    if kind_name in LINEAR_MODELS:
+        kind = LINEAR_MODELS[kind_name]
+        arrays["coefficients"] = model.coefficients.toArray().astype(np.float64)
+        arrays["intercept"] = np.array([model.intercept], dtype=np.float64)
+    elif kind_name in TREE_MODELS:
+        kind = TREE_MODELS[kind_name]
+        arrays.update(_tree_arrays(model, kind))
+    else:
+        raise ValueError(f"unsupported model type {kind_name}")
+
+    meta = {"version": FORMAT_VERSION, "model": kind_name, "kind": kind, "features": features}
+    np.savez_compressed(path, meta=np.array(json.dumps(meta)), **arrays)
+    return path
+
+
+class BookingScorer:
+    """Cancellation scores of bookings from a file written by :func:`export_scorer`.
+
+    ``score`` returns the probability of cancellation, except for LinearSVC
+    models, which have no probability and return the SVM margin.
+    Categorical values never seen during fitting get the index after the
+    vocabulary, as StringIndexer does with ``handleInvalid='keep'``.
+    """
+
+    def __init__(self, meta, arrays):
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"unsupported scorer format version {meta['version']}")
+        self.kind = meta["kind"]
+        self.model = meta["model"]
+        self.features = meta["features"]
+        self.columns = [f["column"] for f in self.features]
+        self._vocabularies = {}
+        self._sorted_vocabularies = {}
+        for position, feature in enumerate(self.features):
+            if feature["categorical"]:
+                labels = arrays[f"vocabulary_{position}"]
+                self._vocabularies[position] = {label: i for i, label in enumerate(labels.tolist())}
+                order = np.argsort(labels)
+                self._sorted_vocabularies[position] = (labels[order], order.astype(np.int64))
+        if self.kind in ("logistic", "margin"):
+            self.coefficients = arrays["coefficients"]
+            self.intercept = float(arrays["intercept"][0])
+            self._coefficients = self.coefficients.tolist()
+        else:
+            for key in ("tree_roots", "tree_weights", "node_feature", "node_threshold", "node_left",
+                        "node_right", "node_value", "node_category", "category_left"):
+                setattr(self, key, arrays[key])
+            # plain lists make the single-booking traversal much faster than NumPy scalars
+            self._nodes = list(zip(self.node_feature.tolist(), self.node_threshold.tolist(),
+                                   self.node_left.tolist(), self.node_right.tolist(),
+                                   self.node_value.tolist(), self.node_category.tolist()))
+            self._category_left = [set(np.flatnonzero(row).tolist()) for row in self.category_left]
+            self._trees = list(zip(self.tree_roots.tolist(), self.tree_weights.tolist()))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        return cls(json.loads(str(arrays.pop("meta"))), arrays)
+
+    def feature_vector(self, booking):
+        """Feature list of one booking dict, in the assembler order."""
+        vector = []
+        for position, feature in enumerate(self.features):
+            value = booking[feature["column"]]
+            if feature["categorical"]:
+                vocabulary = self._vocabularies[position]
+                vector.append(float(vocabulary.get(value, len(vocabulary))))
+            else:
+                vector.append(float(value))
+        return vector
+
+    def feature_matrix(self, columns):
+        """(n, d) feature matrix of a batch given as column name -> array (or a DataFrame)."""
+        n = len(columns[self.columns[0]])
+        matrix = np.empty((n, len(self.features)), dtype=np.float64)
+        for position, feature in enumerate(self.features):
+            values = np.asarray(columns[feature["column"]])
+            if feature["categorical"]:
+                labels, order = self._sorted_vocabularies[position]
+                values = values.astype(str)
+                found = np.searchsorted(labels, values).clip(max=max(len(labels) - 1, 0))
+                known = labels[found] == values if len(labels) else np.zeros(n, dtype=bool)
+                matrix[:, position] = np.where(known, order[found], len(labels))
+            else:
+                matrix[:, position] = values
+        return matrix
+
+    def score(self, booking):
+        """Cancellation score of one booking dict."""
+        x = self.feature_vector(booking)
+        if self.kind in ("logistic", "margin"):
+            margin = self.intercept + sum(w * v for w, v in zip(self._coefficients, x))
+            return margin if self.kind == "margin" else 1.0 / (1.0 + math.exp(-margin))
+        total = 0.0
+        for root, weight in self._trees:
+            node = root
+            feature, threshold, left, right, value, category = self._nodes[node]
+            while left >= 0:
+                if category >= 0:
+                    go_left = int(x[feature]) in self._category_left[category]
+                else:
+                    go_left = x[feature] <= threshold
+                node = left if go_left else right
+                feature, threshold, left, right, value, category = self._nodes[node]
+            total += weight * value
+        return 1.0 / (1.0 + math.exp(-2.0 * total)) if self.kind == "gbt" else total
+
+    def score_batch(self, columns):
+        """Cancellation scores of a batch given as column name -> array (or a DataFrame)."""
+        x = self.feature_matrix(columns)
+        if self.kind in ("logistic", "margin"):
+            margin = x @ self.coefficients + self.intercept
+            return margin if self.kind == "margin" else 1.0 / (1.0 + np.exp(-margin))
+        rows = np.arange(len(x))
+        total = np.zeros(len(x))
+        width = self.category_left.shape[1]
+        for root, weight in zip(self.tree_roots, self.tree_weights):
+            node = np.full(len(x), root, dtype=np.int64)
+            active = self.node_left[node] >= 0
+            while active.any():
+                current = node[active]
+                values = x[rows[active], self.node_feature[current]]
+                category = self.node_category[current]
+                go_left = values <= self.node_threshold[current]
+                split = category >= 0
+                if split.any():
+                    codes = values[split].astype(np.int64)
+                    in_range = (codes >= 0) & (codes < width)
+                    left_of = np.zeros(len(codes), dtype=bool)
+                    left_of[in_range] = self.category_left[category[split][in_range], codes[in_range]]
+                    go_left[split] = left_of
+                node[active] = np.where(go_left, self.node_left[current], self.node_right[current])
+                active = self.node_left[node] >= 0
+            total += weight * self.node_value[node]
+        return self._link(total)
+
+    def _link(self, total):
+        # GBT sums weighted regression leaves into a margin of the logistic loss
+        if self.kind == "gbt":
+            return 1.0 / (1.0 + np.exp(-2.0 * total))
+        return total
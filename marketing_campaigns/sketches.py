@@ -0,0 +1,293 @@
+"""Mergeable quantile sketches and moment accumulators.
+
+The profile's quartiles and median, the skewness chart and the IQR outlier
+bounds need exact quantiles or moments over whole columns, i.e. all the
+values in memory and a sort. :class:`ColumnSketches` keeps, per column, a KLL
+quantile sketch (Karnin, Lang and Liberty) and the count, mean and central
+moments up to the fourth; both are built per chunk or per Spark partition and
+merged, so the statistics of out-of-core data cost one streaming pass and
+new rows are added without revisiting the old ones.
+
+The quantiles are within ``rank_error`` (a fraction of the row count) of the
+exact ones, and exact as long as a column has fewer values than the sketch
+capacity; the moments, and so the skewness, are exact.
+"""
+import copy
+import math
+
+import numpy as np
+import pandas as pd
+
+from marketing_campaigns.mergeable import reduce_chunks, reduce_partitions, row_chunks
+
+DEFAULT_K = 400
+INTERPOLATIONS = ("linear", "midpoint")
+_CAPACITY_DECAY = 2 / 3
+
+
+def rank_error(k):
+    """Normalized rank error bound (99% confidence) of a KLL sketch with parameter ``k``."""
+    return 2.296 / k ** 0.9723
+
+
+def k_for_error(error):
+    """Smallest KLL ``k`` whose normalized rank error is at most ``error``."""
+    return max(8, math.ceil((2.296 / error) ** (1 / 0.9723)))
+
+
+class KLLSketch:
+    """KLL quantile sketch of one column.
+
+    Level ``h`` holds items of weight ``2**h``; a level over its capacity is sorted
+    and every other item (from a random offset) moves up one level.
+
+    Parameters:
+    - k: capacity of the top level, trading memory (about 3k items) for accuracy
+    - seed: seed of the compaction offsets
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self):
+        return rank_error(self.k)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(2, math.ceil(self.k * _CAPACITY_DECAY ** depth))
+
+    def _compress(self):
+        compacted = True
+        while compacted:
+            compacted = False
+            for level, items in enumerate(self.levels):
+                if len(items) <= self._capacity(level):
+                    continue
+                items = np.sort(items)
+                # an odd item stays behind, the rest is halved
+                keep, rest = items[:len(items) % 2], items[len(items) % 2:]
+                promoted = rest[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                if level + 1 == len(self.levels):
+                    self.levels.append(promoted)
+                else:
+                    self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                compacted = True
+                break
+
+    def update(self, values):
+        """Add an array of values; NaN is skipped."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.minimum = min(self.minimum, values.min())
+        self.maximum = max(self.maximum, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Combine with the sketch of other values."""
+        self.k = max(self.k, other.k)
+        for level, items in enumerate(other.levels):
+            if level < len(self.levels):
+                self.levels[level] = np.concatenate([self.levels[level], items])
+            else:
+                self.levels.append(items.copy())
+        self.n += other.n
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self._compress()
+        return self
+
+    def quantile(self, q, interpolation="linear"):
+        """Approximate quantiles, with the interpolation semantics of ``Series.quantile``.
+
+        Parameters:
+        - q: float or list of floats in [0, 1]
+        - interpolation: 'linear' or 'midpoint'
+
+        Returns:
+        - float or numpy array (NaN for an empty sketch)
+        """
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"interpolation must be one of {INTERPOLATIONS}, got {interpolation!r}")
+        qs = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        if self.n == 0:
+            result = np.full(len(qs), np.nan)
+        else:
+            items = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+            order = np.argsort(items, kind="stable")
+            # compactions preserve the total weight, so the item covering rank r is the first
+            # whose cumulative weight exceeds r
+            items, cumulative = items[order], np.cumsum(weights[order])
+            ranks = qs * (self.n - 1)
+
+            def at(rank):
+                return items[np.minimum(np.searchsorted(cumulative, rank, side="right"), len(items) - 1)]
+
+            lower, upper = at(np.floor(ranks)), at(np.ceil(ranks))
+            fraction = 0.5 if interpolation == "midpoint" else ranks - np.floor(ranks)
+            result = np.where(upper == lower, lower, lower + (upper - lower) * fraction)
+            result = np.clip(result, self.minimum, self.maximum)
+        return result if np.ndim(q) else float(result[0])
+
+
+class Moments:
+    """Count, mean, central moments up to the fourth, min and max of several columns.
+
+    Merged with the pairwise formulas of Chan et al. / Pebay, so the result is exact.
+    """
+
+    def __init__(self, columns, n, mean, m2, m3, m4, minimum, maximum):
+        self.columns = list(columns)
+        self.n, self.mean, self.m2, self.m3, self.m4 = n, mean, m2, m3, m4
+        self.minimum, self.maximum = minimum, maximum
+
+    @classmethod
+    def from_frame(cls, df, columns):
+        values = df[list(columns)].to_numpy(dtype=np.float64, na_value=np.nan)
+        present = ~np.isnan(values)
+        n = present.sum(axis=0).astype(np.float64)
+        mean = np.where(present, values, 0.0).sum(axis=0) / np.maximum(n, 1)
+        deviation = np.where(present, values - mean, 0.0)
+        squared = deviation * deviation
+        minimum = np.where(present, values, np.inf).min(axis=0, initial=np.inf)
+        maximum = np.where(present, values, -np.inf).max(axis=0, initial=-np.inf)
+        return cls(columns, n, mean, squared.sum(axis=0), (squared * deviation).sum(axis=0),
+                   (squared * squared).sum(axis=0), minimum, maximum)
+
+    def merge(self, other):
+        # an empty side has n == 0 and zero moments, which every term below handles
+        na, nb = self.n, other.n
+        n = na + nb
+        safe_n = np.maximum(n, 1)
+        delta = other.mean - self.mean
+        m2 = self.m2 + other.m2 + delta ** 2 * na * nb / safe_n
+        m3 = (self.m3 + other.m3 + delta ** 3 * na * nb * (na - nb) / safe_n ** 2
+              + 3 * delta * (na * other.m2 - nb * self.m2) / safe_n)
+        m4 = (self.m4 + other.m4 + delta ** 4 * na * nb * (na * na - na * nb + nb * nb) / safe_n ** 3
+              + 6 * delta ** 2 * (na * na * other.m2 + nb * nb * self.m2) / safe_n ** 2
+              + 4 * delta * (na * other.m3 - nb * self.m3) / safe_n)
+        self.mean = self.mean + delta * nb / safe_n
+        self.n, self.m2, self.m3, self.m4 = n, m2, m3, m4
+        self.minimum = np.minimum(self.minimum, other.minimum)
+        self.maximum = np.maximum(self.maximum, other.maximum)
+        return self
+
+    def skew(self):
+        """Bias-adjusted sample skewness, as ``Series.skew`` (NaN below 3 values, 0 for constants)."""
+        n, m2, m3 = self.n, self.m2, self.m3
+        with np.errstate(invalid="ignore", divide="ignore"):
+            g1 = np.sqrt(n) * m3 / m2 ** 1.5
+            skew = np.sqrt(n * (n - 1)) / (n - 2) * g1
+        skew = np.where(m2 <= 1e-14 * np.maximum(n, 1), 0.0, skew)
+        return pd.Series(np.where(n < 3, np.nan, skew), index=self.columns)
+
+
+class ColumnSketches:
+    """KLL sketches and moments of several numeric columns.
+
+    Parameters:
+    - columns: column names
+    - k: KLL ``k`` of every sketch (see k_for_error())
+    - seed: seed of the compactions
+    """
+
+    def __init__(self, columns, k=DEFAULT_K, seed=None):
+        self.columns = list(columns)
+        self.k = k
+        seeds = np.random.SeedSequence(seed).spawn(len(self.columns))
+        self.sketches = {c: KLLSketch(k, s) for c, s in zip(self.columns, seeds)}
+        self.moments = None
+
+    @classmethod
+    def from_frame(cls, df, columns=None, k=DEFAULT_K, seed=None):
+        if columns is None:
+            columns = list(df.select_dtypes(include="number").columns)
+        return cls(columns, k=k, seed=seed).update(df)
+
+    def update(self, df):
+        """Add the rows of a DataFrame with these columns."""
+        for column, sketch in self.sketches.items():
+            sketch.update(df[column].to_numpy(dtype=np.float64, na_value=np.nan))
+        moments = Moments.from_frame(df, self.columns)
+        self.moments = moments if self.moments is None else self.moments.merge(moments)
+        return self
+
+    def merge(self, other):
+        if other.columns != self.columns:
+            raise ValueError("sketches of different columns cannot be merged")
+        for column, sketch in other.sketches.items():
+            self.sketches[column].merge(sketch)
+        if other.moments is not None:
+            self.moments = copy.deepcopy(other.moments) if self.moments is None else self.moments.merge(other.moments)
+        return self
+
+    @property
+    def rank_error(self):
+        return rank_error(self.k)
+
+    def quantile(self, q, interpolation="linear"):
+        """DataFrame indexed by ``q`` with a column per sketched column, like ``df.quantile``."""
+        q = list(np.atleast_1d(q))
+        return pd.DataFrame({c: s.quantile(q, interpolation) for c, s in self.sketches.items()}, index=q)
+
+    def skew(self):
+        return self.moments.skew()
+
+    def iqr_bounds(self, columns=None, k=1.5, interpolation="linear"):
+        """q1, q3 and the ``k``-IQR bounds per column, in the format of outliers.iqr_bounds()."""
+        quantiles = self.quantile([0.25, 0.75], interpolation)
+        q1, q3 = quantiles.loc[0.25], quantiles.loc[0.75]
+        iqr = q3 - q1
+        bounds = pd.DataFrame({"q1": q1, "q3": q3, "lower": q1 - k * iqr, "upper": q3 + k * iqr})
+        return bounds if columns is None else bounds.loc[list(columns)]
+
+    def numeric_summary(self, k=1.5):
+        """min/max/mean/skew/q1/median/q3 and IQR bounds per column, as DataProfile.numeric."""
+        moments = self.moments
+        stats = pd.DataFrame({"min": moments.minimum, "max": moments.maximum, "mean": moments.mean},
+                             index=self.columns)
+        stats.loc[moments.n == 0] = np.nan
+        stats["skew"] = moments.skew()
+        quantiles = self.quantile([0.25, 0.5, 0.75])
+        stats["q1"], stats["median"], stats["q3"] = quantiles.loc[0.25], quantiles.loc[0.5], quantiles.loc[0.75]
+        iqr = stats["q3"] - stats["q1"]
+        stats["lower"] = stats["q1"] - k * iqr
+        stats["upper"] = stats["q3"] + k * iqr
+        return stats
+
+
+def sketch_chunks(chunks, columns, k=DEFAULT_K, seed=None, max_workers=None):
+    """ColumnSketches of ``columns`` over an iterable of DataFrames, built in parallel threads.
+
+    With a ``seed``, chunk ``i`` is sketched with the seed ``[seed, i]``, so the result
+    doesn't depend on the thread scheduling.
+    """
+    def build(numbered):
+        i, chunk = numbered
+        return ColumnSketches.from_frame(chunk, columns, k=k, seed=None if seed is None else [seed, i])
+
+    return reduce_chunks(build, enumerate(chunks), max_workers) or ColumnSketches(columns, k=k)
+
+
+def sketch_frame(df, columns, k=DEFAULT_K, chunk_rows=1_000_000, max_workers=None):
+    """ColumnSketches of ``columns`` of an in-memory DataFrame, over row chunks in parallel."""
+    return sketch_chunks(row_chunks(df, chunk_rows), columns, k=k, max_workers=max_workers)
+
+
+def spark_sketches(sdf, columns, k=DEFAULT_K):
+    """ColumnSketches of Spark DataFrame columns, one per partition merged on the driver."""
+    columns = list(columns)
+    return (reduce_partitions(sdf.select(*columns), lambda batch: ColumnSketches.from_frame(batch, columns, k=k))
+            or ColumnSketches(columns, k=k))
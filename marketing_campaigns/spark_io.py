@@ -0,0 +1,113 @@
+"""pandas <-> Spark handoff through Arrow with an explicit schema.
+
+``spark.createDataFrame(df)`` without a schema and without Arrow infers the
+types in Python and serializes the frame row by row into the JVM.
+:func:`to_spark` derives a ``StructType`` from the pandas dtypes and ships
+Arrow record batches instead; :func:`to_pandas` is the reverse path used for
+``toPandas()`` collects. Both report their throughput.
+"""
+import logging
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10_000
+
+
+class TransferStats(namedtuple("TransferStats", ["direction", "rows", "seconds"])):
+    """Rows moved between pandas and Spark and the wall time it took."""
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+    def __str__(self):
+        return f"{self.direction}: {self.rows:,} rows in {self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/s)"
+
+
+def _spark_type(dtype):
+    from pyspark.sql import types as T
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        return _spark_type(dtype.categories.dtype)
+    if pd.api.types.is_bool_dtype(dtype):
+        return T.BooleanType()
+    if pd.api.types.is_integer_dtype(dtype):
+        return {1: T.ByteType(), 2: T.ShortType(), 4: T.IntegerType()}.get(np.dtype(dtype).itemsize, T.LongType())
+    if pd.api.types.is_float_dtype(dtype):
+        return T.FloatType() if np.dtype(dtype).itemsize == 4 else T.DoubleType()
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return T.TimestampType()
+    return T.StringType()
+
+
+def spark_schema(df):
+    """Spark ``StructType`` matching the dtypes of a pandas DataFrame.
+
+    Downcast pandas columns keep their width (int8 -> ByteType, float32 -> FloatType)
+    and categoricals map to the type of their categories.
+    """
+    from pyspark.sql import types as T
+
+    return T.StructType([T.StructField(str(name), _spark_type(dtype), nullable=True)
+                         for name, dtype in df.dtypes.items()])
+
+
+def create_spark_session(app_name="Python Spark DataFrames basic example", batch_size=DEFAULT_BATCH_SIZE):
+    """SparkSession with FAIR scheduling (for concurrent model fits) and Arrow transfers enabled."""
+    from pyspark.sql import SparkSession
+
+    spark = SparkSession.builder.appName(app_name).config("spark.scheduler.mode", "FAIR").getOrCreate()
+    enable_arrow(spark, batch_size)
+    return spark
+
+
+def enable_arrow(spark, batch_size=DEFAULT_BATCH_SIZE):
+    """Turn on Arrow transfers for ``createDataFrame``/``toPandas`` with ``batch_size`` rows per record batch."""
+    spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", "true")
+    spark.conf.set("spark.sql.execution.arrow.maxRecordsPerBatch", str(batch_size))
+
+
+def to_spark(spark, df, batch_size=DEFAULT_BATCH_SIZE, schema=None):
+    """Convert a pandas DataFrame to Spark through Arrow record batches.
+
+    Parameters:
+    - spark: SparkSession
+    - df: pandas DataFrame
+    - batch_size: rows per Arrow record batch
+    - schema: Spark schema; derived from the pandas dtypes when omitted
+
+    Returns:
+    - (Spark DataFrame, TransferStats)
+    """
+    enable_arrow(spark, batch_size)
+    start = time.perf_counter()
+    sdf = spark.createDataFrame(df, schema=schema if schema is not None else spark_schema(df))
+    stats = TransferStats("pandas -> spark", len(df), time.perf_counter() - start)
+    logger.info("%s", stats)
+    return sdf, stats
+
+
+def to_pandas(sdf, limit=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Collect a Spark DataFrame to pandas through Arrow record batches.
+
+    Parameters:
+    - sdf: Spark DataFrame
+    - limit: collect only the first ``limit`` rows (e.g. for ``head(2)``)
+    - batch_size: rows per Arrow record batch
+
+    Returns:
+    - (pandas DataFrame, TransferStats)
+    """
+    enable_arrow(sdf.sparkSession, batch_size)
+    if limit is not None:
+        sdf = sdf.limit(limit)
+    start = time.perf_counter()
+    df = sdf.toPandas()
+    stats = TransferStats("spark -> pandas", len(df), time.perf_counter() - start)
+    logger.info("%s", stats)
+    return df, stats
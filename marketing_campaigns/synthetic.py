@@ -0,0 +1,266 @@
+"""Vectorized synthetic bookings with the schema of ``egphotelbookings.csv``.
+
+The marginals and the dependencies the notebook reports are reproduced:
+cancellation by deposit type (No Deposit ~28%, Non Refund ~99%) and customer
+type, lead time by cancellation, seasonal arrival months, ADR by month, room
+type and hotel, agents 9/240/7 as the busiest agencies and the reserved room
+mix A >> D > E > F > G > B > C > H > L. Every column is drawn with one NumPy
+call per chunk, and :func:`write_synthetic` writes the chunks in parallel
+processes to a partitioned Parquet dataset; the chunk seeds are spawned from
+one ``SeedSequence``, so a seed gives the same rows for any number of workers.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from marketing_campaigns.schema import BOOKING_DTYPES
+
+GENERATOR_VERSION = 1
+DEFAULT_CHUNK_ROWS = 1_000_000
+# the leading underscore keeps the file out of the Parquet dataset
+META_FILE = "_synthetic.json"
+
+HOTELS = {"JW Marriott Hotel": 0.664, "Renaissance Hotel": 0.336}
+HOTEL_ADR_FACTOR = {"JW Marriott Hotel": 1.04, "Renaissance Hotel": 0.92}
+YEARS = {2017: 0.184, 2018: 0.475, 2019: 0.341}
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+          "November", "December"]
+MONTH_DAYS = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+# bookings per arrival month, and the average adr of the non-cancelled bookings (notebook query)
+MONTH_BOOKINGS = [5929, 8068, 9794, 11089, 11791, 10939, 12661, 13877, 10508, 11160, 6794, 6780]
+MONTH_ADR = [67.17, 72.26, 77.10, 96.13, 102.90, 111.98, 121.51, 125.40, 105.75, 86.58, 70.50, 75.55]
+
+CUSTOMER_TYPES = {"Transient": 0.704, "Transient-Party": 0.21, "Contract": 0.034, "Group": 0.005}
+DEPOSIT_TYPES = {"No Deposit": 0.8765, "Non Refund": 0.1222, "Refundable": 0.0014}
+# cancellation rate per deposit type, scaled per customer type except for Non Refund
+DEPOSIT_CANCEL_RATE = {"No Deposit": 0.28, "Non Refund": 0.99, "Refundable": 0.22}
+CUSTOMER_CANCEL_FACTOR = {"Transient": 1.12, "Transient-Party": 0.78, "Contract": 1.0, "Group": 0.35}
+
+MEALS = {"BB": 0.773, "HB": 0.121, "SC": 0.089, "Undefined": 0.0098, "FB": 0.0067}
+CHANNELS = {"TA/TO": 0.82, "Direct": 0.123, "Corporate": 0.056, "GDS": 0.0016, "Undefined": 0.00004}
+COUNTRIES = {
+    "PRT": 0.407, "GBR": 0.102, "FRA": 0.087, "ESP": 0.072, "DEU": 0.061, "ITA": 0.032, "IRL": 0.028,
+    "BEL": 0.020, "BRA": 0.019, "NLD": 0.018, "USA": 0.018, "CHE": 0.015, "CN": 0.011, "AUT": 0.011,
+    "SWE": 0.009, "CHN": 0.008, "POL": 0.008, "ISR": 0.006, "RUS": 0.005, "NOR": 0.005, "ROU": 0.004,
+    "FIN": 0.004, "DNK": 0.004, "AUS": 0.004, "AGO": 0.003, "LUX": 0.002, "MAR": 0.002, "TUR": 0.002,
+    "HUN": 0.002, "ARG": 0.002, "JPN": 0.002,
+}
+MISSING_COUNTRY_RATE = 0.004
+
+# reserved room mix and adr relative to room A
+ROOM_TYPES = {"A": 85994, "D": 19201, "E": 6535, "F": 2897, "G": 2094, "B": 1118, "C": 932, "H": 601, "L": 6}
+ROOM_ADR_FACTOR = {"A": 1.0, "B": 1.0, "C": 1.45, "D": 1.25, "E": 1.35, "F": 1.75, "G": 1.9, "H": 1.95, "L": 1.9}
+# room given instead of the reserved one, for the bookings that are reassigned
+REASSIGNED_ROOMS = {"A": 0.2, "B": 0.04, "C": 0.07, "D": 0.35, "E": 0.1, "F": 0.08, "G": 0.05, "H": 0.03,
+                    "I": 0.05, "K": 0.03}
+REASSIGNED_RATE = 0.125
+
+# share of the bookings made through an agency that each of the busiest agencies has;
+# the rest is spread over the other ids up to 535
+TOP_AGENTS = {9: 0.28, 240: 0.118, 7: 0.046, 14: 0.044, 250: 0.031, 241: 0.02, 28: 0.019, 8: 0.018, 6: 0.018,
+              1: 0.017, 3: 0.015, 37: 0.014}
+MISSING_AGENT_RATE = 0.137
+MISSING_COMPANY_RATE = 0.943
+
+
+def _categorical(rng, spec, size):
+    """Draw categorical values with probabilities proportional to the ``spec`` weights."""
+    categories = sorted(spec)
+    p = np.array([spec[c] for c in categories], dtype=np.float64)
+    codes = rng.choice(len(categories), size=size, p=p / p.sum())
+    return codes, categories
+
+
+def _small_counts(rng, p, size):
+    """Draw 0, 1, 2, ... with probabilities ``p``."""
+    p = np.asarray(p, dtype=np.float64)
+    return rng.choice(len(p), size=size, p=p / p.sum())
+
+
+def _where_canceled(canceled, kept_values, canceled_values):
+    return np.where(canceled, canceled_values, kept_values)
+
+
+def generate_bookings(rows, seed=None, offset=0):
+    """Generate ``rows`` synthetic bookings.
+
+    Parameters:
+    - rows: number of rows
+    - seed: int or numpy SeedSequence
+    - offset: first value of the ``Unnamed: 0`` row number
+
+    Returns:
+    - DataFrame with the columns and dtypes of schema.BOOKING_DTYPES
+    """
+    rng = np.random.default_rng(seed)
+    n = rows
+
+    hotel, hotels = _categorical(rng, HOTELS, n)
+    years = np.array(list(YEARS))[_small_counts(rng, list(YEARS.values()), n)]
+    month = _small_counts(rng, MONTH_BOOKINGS, n)
+    day = (rng.random(n) * np.array(MONTH_DAYS)[month]).astype(np.int64) + 1
+    dates = (years - 1970) * 12 + month
+    arrival = pd.DatetimeIndex(dates.astype("datetime64[M]").astype("datetime64[D]") + (day - 1))
+
+    customer, customers = _categorical(rng, CUSTOMER_TYPES, n)
+    deposit, deposits = _categorical(rng, DEPOSIT_TYPES, n)
+    rate = np.array([DEPOSIT_CANCEL_RATE[d] for d in deposits])[deposit]
+    factor = np.array([CUSTOMER_CANCEL_FACTOR[c] for c in customers])[customer]
+    non_refund = deposit == deposits.index("Non Refund")
+    p_cancel = np.where(non_refund, rate, np.minimum(rate * factor, 1.0))
+    canceled = rng.random(n) < p_cancel
+
+    lead_time = _where_canceled(canceled, rng.gamma(0.75, 107.0, n), rng.gamma(1.3, 110.0, n))
+    weekend = np.minimum(rng.poisson(0.93, n), 19)
+    week = np.minimum(rng.poisson(2.5, n), 50)
+
+    room, rooms = _categorical(rng, ROOM_TYPES, n)
+    assigned_spec = dict(REASSIGNED_ROOMS, **{r: 0.0 for r in rooms if r not in REASSIGNED_ROOMS})
+    reassigned_code, assigned_rooms = _categorical(rng, assigned_spec, n)
+    # the reserved room codes mapped into the (larger) assigned-room categories
+    reserved_as_assigned = np.array([assigned_rooms.index(r) for r in rooms])[room]
+    assigned = np.where(rng.random(n) < REASSIGNED_RATE, reassigned_code, reserved_as_assigned)
+
+    month_adr = np.array(MONTH_ADR)[month]
+    room_factor = np.array([ROOM_ADR_FACTOR[r] for r in rooms])
+    room_p = np.array([ROOM_TYPES[r] for r in rooms], dtype=np.float64)
+    hotel_factor = np.array([HOTEL_ADR_FACTOR[h] for h in hotels])[hotel]
+    sigma = 0.3
+    # normalized so that the mean adr per month matches MONTH_ADR over the room mix
+    adr = (month_adr * room_factor[room] / np.dot(room_p / room_p.sum(), room_factor) * hotel_factor
+           * rng.lognormal(-sigma ** 2 / 2, sigma, n))
+
+    agent_ids = np.array(list(TOP_AGENTS), dtype=np.float32)
+    agent_share = np.array(list(TOP_AGENTS.values()))
+    other_agents = np.setdiff1d(np.arange(2, 536), agent_ids).astype(np.float32)
+    top = rng.random(n) < agent_share.sum()
+    agent = np.where(top, agent_ids[rng.choice(len(agent_ids), n, p=agent_share / agent_share.sum())],
+                     other_agents[rng.integers(0, len(other_agents), n)])
+    agent[rng.random(n) < MISSING_AGENT_RATE] = np.nan
+    company = rng.integers(6, 544, n).astype(np.float32)
+    company[rng.random(n) < MISSING_COMPANY_RATE] = np.nan
+
+    country, countries = _categorical(rng, COUNTRIES, n)
+    country[rng.random(n) < MISSING_COUNTRY_RATE] = -1
+    meal, meals = _categorical(rng, MEALS, n)
+    channel, channels = _categorical(rng, CHANNELS, n)
+
+    repeated = rng.random(n) < 0.032
+    previous_cancellations = np.where(rng.random(n) < np.where(canceled, 0.09, 0.02), rng.geometric(0.7, n), 0)
+    previous_not_canceled = np.where(repeated, rng.geometric(0.25, n), 0)
+    waiting = np.where(rng.random(n) < 0.031, np.minimum(rng.gamma(1.5, 40.0, n), 391), 0)
+    changes = _where_canceled(canceled, _small_counts(rng, [0.8, 0.13, 0.05, 0.013, 0.007], n),
+                              _small_counts(rng, [0.91, 0.065, 0.018, 0.005, 0.002], n))
+    parking = np.where(canceled, 0, _small_counts(rng, [0.915, 0.084, 0.001], n))
+    requests = _where_canceled(canceled, _small_counts(rng, [0.48, 0.33, 0.15, 0.035, 0.005, 0.0005], n),
+                               _small_counts(rng, [0.75, 0.17, 0.06, 0.015, 0.004, 0.001], n))
+
+    columns = {}
+    columns["Unnamed: 0"] = np.arange(offset, offset + n)
+    columns["hotel"] = pd.Categorical.from_codes(hotel, hotels)
+    columns["is_canceled"] = canceled
+    columns["lead_time"] = np.minimum(lead_time, 737)
+    columns["arrival_date_year"] = years
+    columns["arrival_date_month"] = pd.Categorical.from_codes(month, MONTHS).set_categories(sorted(MONTHS))
+    columns["arrival_date_week_number"] = arrival.isocalendar().week.to_numpy(dtype=np.int64)
+    columns["arrival_date_day_of_month"] = day
+    columns["stays_in_weekend_nights"] = weekend
+    columns["stays_in_week_nights"] = week
+    columns["adults"] = _small_counts(rng, [0.004, 0.19, 0.75, 0.053, 0.003], n)
+    columns["children"] = _small_counts(rng, [0.928, 0.041, 0.031, 0.0003], n)
+    columns["babies"] = _small_counts(rng, [0.992, 0.0075, 0.0005], n)
+    columns["meal"] = pd.Categorical.from_codes(meal, meals)
+    columns["country"] = pd.Categorical.from_codes(country, countries)
+    columns["distribution_channel"] = pd.Categorical.from_codes(channel, channels)
+    columns["is_repeated_guest"] = repeated
+    columns["previous_cancellations"] = np.minimum(previous_cancellations, 26)
+    columns["previous_bookings_not_canceled"] = np.minimum(previous_not_canceled, 72)
+    columns["reserved_room_type"] = pd.Categorical.from_codes(room, rooms)
+    columns["assigned_room_type"] = pd.Categorical.from_codes(assigned, assigned_rooms)
+    columns["booking_changes"] = changes
+    columns["deposit_type"] = pd.Categorical.from_codes(deposit, deposits)
+    columns["agent"] = agent
+    columns["company"] = company
+    columns["days_in_waiting_list"] = waiting
+    columns["customer_type"] = pd.Categorical.from_codes(customer, customers)
+    columns["adr"] = np.round(np.minimum(adr, 510.0), 2)
+    columns["required_car_parking_spaces"] = parking
+    columns["total_of_special_requests"] = requests
+    return pd.DataFrame(columns).astype(BOOKING_DTYPES)
+
+
+def _chunks(rows, chunk_rows, seed):
+    sizes = [chunk_rows] * (rows // chunk_rows) + ([rows % chunk_rows] if rows % chunk_rows else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    offsets = np.cumsum([0] + sizes[:-1])
+    return [(i, size, chunk_seed, int(offset))
+            for i, (size, chunk_seed, offset) in enumerate(zip(sizes, seeds, offsets))]
+
+
+def _write_chunk(out_dir, index, rows, seed, offset, partition_cols):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(generate_bookings(rows, seed=seed, offset=offset), preserve_index=False)
+    pq.write_to_dataset(table, out_dir, partition_cols=list(partition_cols) or None,
+                        basename_template=f"chunk-{index:05d}-{{i}}.parquet")
+    return rows
+
+
+def write_synthetic(out_dir, rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=0, max_workers=None,
+                    partition_cols=("arrival_date_year",)):
+    """Generate ``rows`` bookings in parallel chunks into a partitioned Parquet dataset.
+
+    Parameters:
+    - out_dir: dataset directory (hive-style partitions)
+    - rows: total number of rows
+    - chunk_rows: rows generated and written per task
+    - seed: seed of the SeedSequence the chunk seeds are spawned from
+    - max_workers: number of generating processes (default: number of CPUs)
+    - partition_cols: partition columns of the dataset
+
+    Returns:
+    - out_dir
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        tasks = [pool.submit(_write_chunk, out_dir, i, size, chunk_seed, offset, tuple(partition_cols))
+                 for i, size, chunk_seed, offset in _chunks(rows, chunk_rows, seed)]
+        written = sum(task.result() for task in tasks)
+    # written last: a dataset without it is incomplete
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump({"rows": written, "seed": seed, "chunk_rows": chunk_rows, "version": GENERATOR_VERSION,
+                   "partition_cols": list(partition_cols)}, f)
+    return out_dir
+
+
+def read_synthetic(path, columns=None, filters=None):
+    """Read a dataset written by :func:`write_synthetic` with the dtypes of load_bookings().
+
+    Parameters:
+    - path: dataset directory
+    - columns: columns to read (default: all)
+    - filters: pyarrow filters, e.g. [("arrival_date_year", "=", 2018)] to read one partition
+
+    Returns:
+    - DataFrame
+    """
+    import pyarrow.parquet as pq
+
+    df = pq.read_table(path, columns=columns, filters=filters).to_pandas()
+    order = [c for c in BOOKING_DTYPES if c in df.columns]
+    # partition columns come back as categoricals of the directory values
+    return df[order].astype({c: BOOKING_DTYPES[c] for c in order})
+
+
+def synthetic_complete(path):
+    """True if ``path`` holds a finished dataset of the current generator version."""
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        return json.load(f).get("version") == GENERATOR_VERSION
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from marketing_campaigns.dag import StageGraph, booking_sources, booking_stages, content_hash  # noqa: E402
+from marketing_campaigns.synthetic import generate_bookings  # noqa: E402
+
+PANDAS_TARGETS = ["profile", "cube", "aggregates"]
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "bookings.csv"
+    generate_bookings(500, seed=1).to_csv(path, index=False)
+    return str(path)
+
+
+def test_content_hash_of_unhashable_cells():
+    import pandas as pd
+
+    frame = pd.DataFrame({"Overview": [[1, 2], [3]]}, index=["a", "b"])
+    assert content_hash(frame) == content_hash(frame.copy())
+    assert content_hash(frame) != content_hash(frame.assign(Overview=[[1], [3]]))
+
+
+def test_pandas_stages_run_then_hit_checkpoints(source, tmp_path):
+    model_dir = str(tmp_path / "models")
+    graph = StageGraph(booking_stages(report_dir=str(tmp_path / "report"), model_dir=model_dir),
+                       checkpoint_dir=str(tmp_path / "checkpoints"))
+    sources = booking_sources(source, model_dir)
+
+    first = graph.run(sources, targets=PANDAS_TARGETS, max_workers=2)
+    assert all(first["_status"][name] == "ran" for name in PANDAS_TARGETS)
+    assert len(first["profile"]) > 0
+
+    second = graph.run(sources, targets=PANDAS_TARGETS, max_workers=2)
+    assert second["_status"] == dict.fromkeys(first["_status"], "cached")
+    assert second["profile"].index.equals(first["profile"].index)
@@ -0,0 +1,38 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from marketing_campaigns.loyalty import SCORE_NAME, _partition_top, loyalty_top  # noqa: E402
+
+
+@pytest.fixture
+def bookings():
+    rng = np.random.default_rng(0)
+    n = 20000
+    # small integer scores, so most ranks are shared by many rows
+    return pd.DataFrame({"previous_cancellations": rng.integers(0, 6, n),
+                         "previous_bookings_not_canceled": rng.integers(0, 3, n)},
+                        index=pd.RangeIndex(100, 100 + n))
+
+
+def expected_top(df, k, threshold=1):
+    scores = df["previous_cancellations"] - df["previous_bookings_not_canceled"]
+    return scores[scores > threshold].sort_values(kind="stable").head(k)
+
+
+@pytest.mark.parametrize("k", [1, 5, 50, 1000])
+def test_top_breaks_ties_by_row_position(bookings, k):
+    top = loyalty_top(bookings, k)
+    expected = expected_top(bookings, k)
+    assert top.index.equals(expected.index)
+    assert top.tolist() == expected.tolist()
+
+
+def test_partition_top_breaks_ties_by_id(bookings):
+    df = bookings.assign(booking_id=np.arange(len(bookings))[::-1])
+    batches = [df.iloc[start:start + 3000] for start in range(0, len(df), 3000)]
+    (best,) = _partition_top(5, 1, "booking_id")(iter(batches))
+    expected = expected_top(df.set_index("booking_id").sort_index(), 5)
+    assert best["booking_id"].tolist() == expected.index.tolist()
+    assert best[SCORE_NAME].tolist() == expected.tolist()
@@ -80,29 +80,25 @@ pd.set_option("display.max.columns",None)
 
 """# ⏳ Loading Dataset"""
 
-df=pd.read_csv("/content/drive/MyDrive/egphotelbookings.csv")
+from marketing_campaigns.loader import load_bookings
+from marketing_campaigns.instrument import Tracer
+
+# wall/CPU time, rows and Spark jobs/shuffle/spill of the main stages (Tracer(memory=True) adds the Python peak memory)
+tracer = Tracer()
+
+# explicit schema: categoricals for the string columns, downcast counts, float32 adr
+with tracer.stage("read_csv") as stage:
+    df=load_bookings("/content/drive/MyDrive/egphotelbookings.csv")
+    stage.rows_out = len(df)
 
 df.head(8)
 
 """# 🧠 Basic Understaning of Data"""
 
-list_of_numerics=df.select_dtypes(include=['float','int']).columns
-types= df.dtypes
-missing= round((df.isnull().sum()/df.shape[0]),3)*100
-overview= df.apply(lambda x: [round(x.min()),
-                                 round(x.max()),
-                                 round(x.mean()),
-                                 round(x.quantile(0.5))] if x.name in list_of_numerics else x.unique())
-
-outliers= df.apply(lambda x: sum(
-                                 (x<(x.quantile(0.25)-1.5*(x.quantile(0.75)-x.quantile(0.25))))|
-                                 (x>(x.quantile(0.75)+1.5*(x.quantile(0.75)-x.quantile(0.25))))
-                                 if x.name in list_of_numerics else ''))
-
-explo = pd.DataFrame({'Types': types,
-                      'Missing%': missing,
-                      'Overview': overview,
-                      'Outliers': outliers}).sort_values(by=['Missing%','Types'],ascending=False)
+from marketing_campaigns.profile import profile_frame
+
+# min/max/mean/median/Q1/Q3, missing %, IQR outlier counts and unique values in one pass per dtype group
+explo = profile_frame(df).summary()
 explo.transpose()
 
 """#### **Company** has 94% null values so we can't fill it, drop it. we don't need babies column so drop this column. **Unnamed**: 0 is just the id drop it. **arrival_date_week_number**: we will not use arrival_date_week_number so drop it."""
@@ -124,7 +120,7 @@ df.dropna(subset=['country', 'children'], inplace=True)
 
 columns=["adr","lead_time","stays_in_weekend_nights","stays_in_week_nights","adults","is_repeated_guest","previous_cancellations","previous_bookings_not_canceled","booking_changes","days_in_waiting_list","required_car_parking_spaces","total_of_special_requests"]
 
-skewness = df[columns].skew().sort_values()
+skewness = profile_frame(df).skewness(columns)
 plt.figure(figsize=(14,6))
 sns.barplot(x=skewness.index, y=skewness, palette=sns.color_palette("Reds",19))
 for i, v in enumerate(skewness):
@@ -138,30 +134,14 @@ plt.tight_layout()
 plt.show()
 
 import seaborn as sns
+from marketing_campaigns.outliers import remove_outlier
 
-def remove_outlier(df, list):
-    """Remove outliers from a specified column using the Interquartile Range (IQR) method.
-
-    Parameters:
-    - df: DataFrame containing the data
-    - col: Column name for which outliers should be removed
-
-    Returns:
-    - DataFrame with outliers removed
-    """
-    for col in list:
-      q1, q3 = df[col].quantile([0.25, 0.75])
-      iqr = q3 - q1
-      lower = q1 - (1.5 * iqr)
-      upper = q3 + (1.5 * iqr)
-
-      df = df[((df[col] >= lower) & (df[col] <= upper))]
-
-    return df
 def boxplot(df, col_name):
     sns.boxplot( data = df[col_name], orient="h")
 
-df=remove_outlier(df,columns)
+# the notebook's column-by-column filter (each column's bounds on the rows left by the previous
+# ones), built as one mask and materialized once; mode="joint" would compute all bounds on the same rows
+df=remove_outlier(df,columns,mode="sequential")
 
 # def remove_outliers(df, col_name):
 #     # remove outliers in lead_time
@@ -180,7 +160,7 @@ df=remove_outlier(df,columns)
 # df = remove_outliers(df, 'lead_time')
 # df = remove_outliers(df, 'adr')
 
-skewness = df[columns].skew().sort_values()
+skewness = profile_frame(df).skewness(columns)
 plt.figure(figsize=(14,6))
 sns.barplot(x=skewness.index, y=skewness, palette=sns.color_palette("Reds",19))
 for i, v in enumerate(skewness):
@@ -195,7 +175,10 @@ plt.show()
 
 """# 📊 Exploatory Data Analysis EDA"""
 
-corr = df.corr(numeric_only=True)
+from marketing_campaigns.correlation import correlation_frame
+
+# same matrix as df.corr(numeric_only=True), from co-moments merged over row chunks computed in parallel
+corr = correlation_frame(df)
 
 # Visualize correlation matrix with heatmap
 plt.figure(figsize=(20, 8))
@@ -249,10 +232,14 @@ sns.histplot(df[(df["is_canceled"]==0 )],y="deposit_type")
 
 """
 
-nodeposit = len(df[(df['deposit_type'] == 'No Deposit')])
-nonrefund = len(df[(df['deposit_type'] == 'Non Refund')])
-nondepositeAndCancelled = len(df[(df['deposit_type'] == 'No Deposit') & (df['is_canceled']==1)])
-nonreufndAndCancelled = len(df[(df['deposit_type'] == 'Non Refund') & (df['is_canceled']==1)])
+from marketing_campaigns.cube import cancellation_cube
+
+# bookings / cancellations / rate of every categorical value, computed once
+cube = cancellation_cube(df)
+nodeposit = cube.bookings('deposit_type', 'No Deposit')
+nonrefund = cube.bookings('deposit_type', 'Non Refund')
+nondepositeAndCancelled = cube.cancellations('deposit_type', 'No Deposit')
+nonreufndAndCancelled = cube.cancellations('deposit_type', 'Non Refund')
 print('No deposit users', nodeposit)
 print('Non Refund users', nonrefund)
 print('No deposit users & cancelled', nondepositeAndCancelled)
@@ -273,12 +260,12 @@ sns.histplot(df[(df["is_canceled"]== 1 )],y="customer_type")
 and Also, need to get the ratio between the number of people who `Transient and cancelled booking`
 """
 
-T_Transient = len(df[(df['customer_type'] == 'Transient')])
-Transient_prety = len(df[(df['customer_type'] == 'Transient-Party')])
-contract = len(df[(df['customer_type'] == 'Contract')])
-T_TransientAndCancelled = len(df[(df['customer_type'] == 'Transient') & (df['is_canceled']==1)])
-Transient_pretyAndCancelled = len(df[(df['customer_type'] == 'Transient-Party') & (df['is_canceled']==1)])
-ContractAndCancelled = len(df[(df['customer_type'] == 'Contract') & (df['is_canceled']==1)])
+T_Transient = cube.bookings('customer_type', 'Transient')
+Transient_prety = cube.bookings('customer_type', 'Transient-Party')
+contract = cube.bookings('customer_type', 'Contract')
+T_TransientAndCancelled = cube.cancellations('customer_type', 'Transient')
+Transient_pretyAndCancelled = cube.cancellations('customer_type', 'Transient-Party')
+ContractAndCancelled = cube.cancellations('customer_type', 'Contract')
 print('customer_type_Transient', T_Transient)
 print('customer_type_Transient_Party',Transient_prety)
 print('T_Transient_users & cancelled', T_TransientAndCancelled)
@@ -287,14 +274,18 @@ print('ratio between Transient  users & cancelled /Transient users  = ', T_Trans
 print('ratio between Transient_prety users & cancelled / Transient_prety users  = ', Transient_pretyAndCancelled/Transient_prety)
 print('ratio between Contract & cancelled / Contract users  = ',ContractAndCancelled/contract)
 
+cube.breakdown('customer_type')
+
 sns.histplot(df[(df["is_canceled"]== 1 )],y="total_of_special_requests")
 
 sns.histplot(df[(df["is_canceled"]== 0 )],y="total_of_special_requests")
 
 """## See which customers are more loyal to their hotel, and the next time any customer has this rule will be given a promotion."""
 
-loyal_customers = df[(df['previous_bookings_not_canceled'] > 3) & (df['previous_cancellations'] == 0)]
-print('number of loyal customers till now', len(loyal_customers))
+from marketing_campaigns.loyalty import count_loyal_customers
+
+# counted from two columns, without copying the matching rows
+print('number of loyal customers till now', count_loyal_customers(df))
 
 """# 📈 Feature Engineering"""
 
@@ -333,9 +324,15 @@ df['revenue'] = df['adr'] * (df['stays_in_weekend_nights'] + df['stays_in_week_n
 ! pip install pyspark
 
 from pyspark.sql import SparkSession
-spark = SparkSession.builder.appName('Python Spark DataFrames basic example').getOrCreate()
+# FAIR scheduling lets the concurrently submitted model fits share the executors
+spark = SparkSession.builder.appName('Python Spark DataFrames basic example').config('spark.scheduler.mode', 'FAIR').getOrCreate()
+
+from marketing_campaigns.spark_io import to_spark, to_pandas
 
-sdf =spark.createDataFrame(df)
+# explicit StructType from the pandas dtypes, shipped as Arrow record batches
+with tracer.stage("createDataFrame", rows_in=len(df)):
+    sdf, transfer = to_spark(spark, df)
+print(transfer)
 
 sdf.printSchema()
 
@@ -344,40 +341,31 @@ sdf.show(3)
 sdf.createOrReplaceTempView("hotels_booking")
 sdf.printSchema()
 
+from marketing_campaigns.campaign_sql import materialize_campaign_aggregates, campaign_insight
+
+# two scans of hotels_booking (the grouped aggregates, the loyalty candidates) compute every insight query below
+with tracer.stage("campaign_aggregates"):
+    materialize_campaign_aggregates(spark)
+
 """### get the most repeated agencies with non cancelled bookings
 
 """
 
-command="""
-select  agent ,count(agent) as numberOfBookings
-from hotels_booking
-where isnan(agent)=0  and is_canceled = 0
-group by agent
-order by numberOfBookings DESC
-limit 5"""
-spark.sql(command).show()
+campaign_insight(spark, 'top_agents').show()
 
 """##### We have `3 `agencies`(9, 240, 7)` that we can offer their users some promotions, as these agencies bring us huge number of visitors.
 
 ### Let's get the users that have large difference between the not canceled bookings and canceled bookings. Any further booking that contains these criteria we will give them promotions. as they are serious customers.
 """
 
-command="""
-select * ,(previous_cancellations-previous_bookings_not_canceled)as loyality FROM hotels_booking
-where (previous_cancellations-previous_bookings_not_canceled) >1
-order by loyality
-limit 5"""
-spark.sql(command).show()
+from marketing_campaigns.loyalty import spark_loyalty_rows
+
+# ranked on the two score columns with a partial top-k per partition; only the 5 winners are read in full
+spark_loyalty_rows(sdf).show()
 
 """### Get the relation between number of stays in weekend and the adr"""
 
-command="""
-select AVG(adr)AS AVG_adr,stays_in_weekend_nights from hotels_booking
-group by stays_in_weekend_nights
-order by AVG_adr DESC
-limit 5
-"""
-spark.sql(command).show()
+campaign_insight(spark, 'weekend_adr').show()
 
 """#### Staying in the weekend `2 or 3` days are the most profitable to the hotel
 
@@ -398,13 +386,7 @@ sns.histplot(data=df[(df['is_canceled'] == 0)], x='reserved_room_type', hue='hot
 
 """
 
-command="""
-select reserved_room_type ,count (reserved_room_type) as counter  from hotels_booking
-where is_canceled =0
-group by reserved_room_type
-order by counter
-"""
-spark.sql(command).show()
+campaign_insight(spark, 'least_booked_rooms').show()
 
 """### We will do promotions on the room types` (L,H,C,B,G)` as they are the least booked. (promotion #3)
 
@@ -413,13 +395,7 @@ spark.sql(command).show()
 
 df.groupby('arrival_date_month')['adr'].sum().plot(kind='bar')
 
-command="""
-select arrival_date_month,avg (adr) as avg_price  from hotels_booking
-where is_canceled=0
-group by arrival_date_month
-order by avg_price DESC
-"""
-spark.sql(command).show()
+campaign_insight(spark, 'monthly_adr').show()
 
 """#### `August, July, June` (summer months) are the highest in room prices. give promotion in these months to increase number of bookings. (promotion#4)
 
@@ -428,77 +404,63 @@ spark.sql(command).show()
 
 df.groupby('arrival_date_month')['revenue'].sum().plot(kind='bar')
 
-command="""
-select arrival_date_month,cast(sum(revenue)as numeric(36,2) )as Total_revenue  from hotels_booking
-where is_canceled=0
-group by arrival_date_month
-order by Total_revenue DESC
-"""
-spark.sql(command).show()
+campaign_insight(spark, 'monthly_revenue').show()
 
 """### The most profitable months are `August, July, June`"""
 
+"""### Audience of every promotion and of their combinations, from one pass over the bookings"""
+
+from marketing_campaigns.promotions import evaluate_rules
+
+segments = evaluate_rules(df)
+print(segments.sizes())
+segments.overlaps()
+
+# e.g. loyal customers booking a least-booked room in summer
+segments.size(all_of=['loyal_customers', 'summer_months'], any_of=['least_booked_rooms'])
+
 # remove some useless columns to the cancelation to get better results with the predictions (features selection)
-sdf_cleaned = sdf.drop('arrival_date_year','arrival_date_day_of_month', 'children', 'meal', 'agent', 'days_in_waiting_list', 'required_car_parking_spaces')
+from marketing_campaigns.featurize import select_features, feature_columns, fit_featurization, feature_frame
+
+sdf_cleaned = select_features(sdf)
 
 """# get numerical , categorical columns of the dataframe
 
 """
 
 # get numerical , categorical columns of the dataframe
-numerical_columns = []
-categorical_columns = []
-for col in sdf_cleaned.dtypes:
-    if col[1] == 'string':
-        categorical_columns.append(col[0])
-    elif col[0] !="is_canceled":
-        numerical_columns.append(col[0])
+numerical_columns, categorical_columns = feature_columns(sdf_cleaned)
 
 numerical_columns
 
 """### Do some preprocessing to be able to fit the model to the data."""
 
-from pyspark.ml import Pipeline
-from pyspark.ml.feature import VectorAssembler
-from sklearn.metrics import accuracy_score
-from pyspark.ml.feature import StringIndexer, VectorAssembler
+# confusion matrix, accuracy, precision/recall/F1 and AUC in one Spark aggregation per model
+from marketing_campaigns.evaluation import evaluate_predictions
 
-# encode the categorical columns to numerical values using StringIndexer
-stages = []
-for categoricalCol in categorical_columns:
-    stringIndexer = StringIndexer(inputCol = categoricalCol, outputCol = categoricalCol + 'Index')
-    stages += [stringIndexer]
+# StringIndexer for every categorical column and the VectorAssembler in one PipelineModel,
+# fitted on sdf_cleaned once and reloaded from disk on later runs of the same csv
+from marketing_campaigns.cache import file_digest
 
-# apply the stages to the dataframe
-featurizationPipeline = Pipeline(stages = stages)
-featurizationPipelineModel = featurizationPipeline.fit(sdf_cleaned)
-sdf = featurizationPipelineModel.transform(sdf_cleaned)
+with tracer.stage("featurization"):
+    featurizationPipelineModel = fit_featurization(sdf_cleaned, path="featurization_pipeline_model",
+                                                   data={"source": file_digest("/content/drive/MyDrive/egphotelbookings.csv")})
 
-# add the independant variables to the stages except the target variable 'is_canceled'
-assemblerInputs = []
-for numericalCol in numerical_columns:
-    assemblerInputs.append(numericalCol)
+# feature_vector / label / is_canceled, persisted so every model reads it without re-indexing
+sdf = feature_frame(featurizationPipelineModel, sdf_cleaned)
 
-for categoricalCol in categorical_columns:
-    if categoricalCol != 'is_canceled':
-        assemblerInputs.append(categoricalCol + "Index")
-
-# add the numerical columns to the stages
-stages_split = []
-assembler = VectorAssembler(inputCols=assemblerInputs, outputCol="feature_vector")
-stages_split += [assembler]
-featurizationPipeline = Pipeline(stages = stages_split)
-featurizationPipelineModel = featurizationPipeline.fit(sdf)
-sdf = featurizationPipelineModel.transform(sdf)
-
-# # add column named 'label' is the same as 'is_canceled' column as the crossvalidator needs it
-sdf = sdf.withColumn("label", sdf["is_canceled"])
-
-sdf.toPandas().head(2)
+to_pandas(sdf, limit=2)[0]
 
 # split the data to train and test
 train, test = sdf.randomSplit([0.8, 0.2], seed = 12345)
 
+from marketing_campaigns.model_zoo import train_model_zoo
+
+# train/test cached once, the five classifiers fitted concurrently (one FAIR pool each) and compared
+with tracer.stage("model_zoo"):
+    zoo = train_model_zoo(train, test)
+zoo.comparison
+
 """### [1st Model] will be logistic regression that predicts whether the booking will be canceled or not
 
 
@@ -506,7 +468,7 @@ train, test = sdf.randomSplit([0.8, 0.2], seed = 12345)
 
 from pyspark.ml.classification import LogisticRegression
 lr = LogisticRegression(featuresCol = 'feature_vector', labelCol = 'is_canceled', maxIter=25)
-lrModel = lr.fit(train)
+lrModel = zoo.models['logistic_regression']
 
 predictions = lrModel.transform(test)
 predictions.select('is_canceled', 'prediction', 'probability').show(10)
@@ -547,7 +509,7 @@ lrModel.evaluate(test).predictions.show(3)
 """### Let's tune the hyperparameters of the model using the `crossValidator` which automate the tuning by trying the given parameters and choose the best one based on the evaluator."""
 
 # tune the model using the training data
-from pyspark.ml.tuning import ParamGridBuilder, CrossValidator
+from pyspark.ml.tuning import ParamGridBuilder
 from pyspark.ml.evaluation import BinaryClassificationEvaluator
 # Create ParamGrid for Cross Validation
 paramGrid = (ParamGridBuilder()
@@ -555,82 +517,105 @@ paramGrid = (ParamGridBuilder()
                 .addGrid(lr.maxIter, [10, 20, 40])
                 .build())
 
-evaluator = BinaryClassificationEvaluator(metricName="areaUnderROC")
-cv = CrossValidator(estimator=lr, estimatorParamMaps=paramGrid, evaluator=evaluator, numFolds=5)
+from marketing_campaigns.tuning import cross_validate
 
-cvModel = cv.fit(train)
-cvModel.bestModel
+evaluator = BinaryClassificationEvaluator(metricName="areaUnderROC")
+# folds cached once, param maps fitted concurrently, maxIter fits skipped once a smaller maxIter converged
+with tracer.stage("cv.fit"):
+    cvResult = cross_validate(lr, paramGrid, evaluator, train, num_folds=5, parallelism=4, seed=12345)
+print('cross validation wall time = ', round(cvResult.wall_seconds, 1), 's')
+print(cvResult.fold_timings())
+cvModel = cvResult.best_model
+cvResult.best_params
 
 predictions = cvModel.transform(test)
 predictions.select('is_canceled', 'prediction', 'probability').show(10)
 
-accuracy = accuracy_score(predictions.select('is_canceled').toPandas(), predictions.select('prediction').toPandas())
+metrics = evaluate_predictions(predictions)
+accuracy = metrics['accuracy']
 print('accuracy of the model = ', accuracy*100, '%')
+metrics
 
 """78% accuracy score for the logistic regression. focus on  `ROC AREA`
 
 ### [2nd Model] will be Decision Tree classifier
 """
 
-from pyspark.ml.classification import DecisionTreeClassifier
-dt=DecisionTreeClassifier(featuresCol="feature_vector",labelCol="is_canceled",maxBins=180)
-dtModel = dt.fit(train)
+dtModel = zoo.models['decision_tree']
 
 predictions = dtModel.transform(test)
 predictions.select('is_canceled', 'prediction', 'probability').show(10)
 
-# get the accuracy of the model using accuracy_score on the test data
-accuracy = accuracy_score(predictions.select('is_canceled').toPandas(), predictions.select('prediction').toPandas())
+# accuracy of the model on the test data (evaluated by the model zoo)
+metrics = zoo.metrics['decision_tree']
+accuracy = metrics['accuracy']
 print('accuracy of the model = ', accuracy*100, '%')
+metrics
 
 """### 77.8 % accuracy for the Decision tree.
 
 # [3rd Model] Try the random forest classifier.
 """
 
-# train random forest model on the data
-from pyspark.ml.classification import RandomForestClassifier
-rf = RandomForestClassifier(featuresCol = 'feature_vector', labelCol = 'is_canceled', maxBins=180)
-rfModel = rf.fit(train)
+# random forest model trained by the model zoo
+rfModel = zoo.models['random_forest']
 
 predictions = rfModel.transform(test)
 predictions.select('is_canceled', 'prediction', 'probability').show(10)
 
-# get the accuracy of the model using accuracy_score on the test data
-accuracy = accuracy_score(predictions.select('is_canceled').toPandas(), predictions.select('prediction').toPandas())
+# accuracy of the model on the test data (evaluated by the model zoo)
+metrics = zoo.metrics['random_forest']
+accuracy = metrics['accuracy']
 print('accuracy of the model = ', accuracy*100, '%')
+metrics
 
 """## Also 79% accuracy for the Random Forest Model.
 
 ## [4th Model] Try to train Support Vector Machines to classify, SVM are the best in binary classifications.
 """
 
-from pyspark.ml.classification import LinearSVC
-svm = LinearSVC(featuresCol = 'feature_vector', labelCol = 'is_canceled', maxIter=10)
-svmModel = svm.fit(train)
+svmModel = zoo.models['svm']
 
 predictions = svmModel.transform(test)
 predictions.select('is_canceled', 'prediction').show(10)
 
 # accuracy of the model
-accuracy = accuracy_score(predictions.select('is_canceled').toPandas(), predictions.select('prediction').toPandas())
+metrics = zoo.metrics['svm']
+accuracy = metrics['accuracy']
 print('accuracy of the model = ', accuracy*100, '%')
+metrics
 
 """75% accuracy SVM
 
 # [5th Model] Try Gradient Boost
 """
 
-from pyspark.ml.classification import GBTClassifier
-gbt = GBTClassifier(featuresCol = 'feature_vector', labelCol = 'is_canceled', maxIter=10, maxBins=180)
-gbtModel = gbt.fit(train)
+gbtModel = zoo.models['gbt']
 
 predictions = gbtModel.transform(test)
 predictions.select('is_canceled', 'prediction').show(10)
 
 # accuracy of the model
-accuracy = accuracy_score(predictions.select('is_canceled').toPandas(), predictions.select('prediction').toPandas())
+metrics = zoo.metrics['gbt']
+accuracy = metrics['accuracy']
 print('accuracy of the model = ', accuracy*100, '%')
+metrics
+
+"""## Export the fitted models for JVM-free scoring at the front desk"""
+
+from marketing_campaigns.scorer import export_scorer, BookingScorer
+
+# StringIndexer vocabularies, assembler column order and LR coefficients / GBT tree arrays
+export_scorer(featurizationPipelineModel, lrModel, "lr_scorer.npz")
+export_scorer(featurizationPipelineModel, gbtModel, "gbt_scorer.npz")
+
+scorer = BookingScorer.load("gbt_scorer.npz")
+scorer.score(df.iloc[0].to_dict())
+
+"""## Where the time went"""
+
+tracer.to_json("run_trace.json")
+tracer.summary()
 
 """# This is formatted as code
 